@@ -0,0 +1,166 @@
+import argparse
+import ast
+import json
+import math
+import sys
+from collections import deque
+from cky import CKY, BitsetCKY
+from cky_probabilistic import ProbabilisticCKY
+from cky_valiant import ValiantCKY
+from cky_viterbi import ViterbiCKY
+from converter import CNFConverter, FastCNFConverter
+from grammar_cache import GrammarCache
+from grammar_file import MAGIC, GrammarFile
+from parallel_parser import CorpusParser
+
+
+ENGINES = {                 # Nom de l'opció --engine -> (classe, fa servir probabilitats)
+    'cky': (CKY, False),
+    'bitset': (BitsetCKY, False),
+    'valiant': (ValiantCKY, False),
+    'probabilistic': (ProbabilisticCKY, True),
+    'viterbi': (ViterbiCKY, True),
+}
+
+
+def is_probabilistic(grammar):
+    '''
+    Comprova si una gramàtica té probabilitats, és a dir, si les regles són de la forma ((head, body), probabilitat).
+    '''
+    return bool(grammar) and isinstance(grammar[0][0], tuple)
+
+
+def read_grammar(path):
+    '''
+    Llegeix una gramàtica d'un fitxer. Pot ser un fitxer binari (vegeu grammar_file.write_grammar), que s'obre amb mmap,
+    o un fitxer de text amb una llista de Python amb totes les regles o amb una regla per línia (com les que
+    s'escriuen a resultats_joc_de_proves.txt).
+
+    Paràmetres:
+        path (str): Ruta del fitxer.
+
+    Retorna:
+        list: La gramàtica (o un GrammarFile).
+    '''
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) == MAGIC:
+            return GrammarFile(path)
+    with open(path, encoding='utf-8') as file:
+        text = file.read().strip()
+    if text.startswith('['):
+        return [tuple(rule) for rule in ast.literal_eval(text)]
+    return [ast.literal_eval(line.strip().rstrip(',')) for line in text.splitlines() if line.strip()]
+
+
+def build_parser(grammar, engine=None, cache_dir=None):
+    '''
+    Prepara la gramàtica i l'analitzador: escull la classe, treu les probabilitats si l'analitzador no en fa servir
+    i, si cal, converteix la gramàtica a CNF (les gramàtiques probabilístiques ja han de ser en CNF; si no, es llança
+    ValueError). Les gramàtiques de text passen per la cau en disc (si n'hi ha).
+
+    Paràmetres:
+        grammar (list): La gramàtica llegida amb read_grammar.
+        engine (str): Nom de l'analitzador (claus d'ENGINES); per defecte segons si la gramàtica té probabilitats.
+        cache_dir (str): Directori de la cau de gramàtiques convertides (None per no fer-la servir).
+
+    Retorna:
+        tuple: La gramàtica en CNF, la classe de l'analitzador i l'analitzador.
+    '''
+    probabilistic = grammar.probabilistic if isinstance(grammar, GrammarFile) else is_probabilistic(grammar)
+    engine_class, engine_probabilistic = ENGINES[engine or ('probabilistic' if probabilistic else 'cky')]
+    if engine_probabilistic and not probabilistic:
+        raise ValueError(f"L'analitzador '{engine}' necessita una gramàtica probabilística")
+    if probabilistic and not engine_probabilistic:
+        grammar = [rule for rule, _ in grammar]     # Els analitzadors sense probabilitats només fan servir les regles
+        probabilistic = False
+    if isinstance(grammar, GrammarFile):            # Els fitxers binaris ja estan en CNF
+        return grammar, engine_class, engine_class(grammar)
+
+    converter = CNFConverter if probabilistic else FastCNFConverter
+    if probabilistic and not converter(grammar, prob=True).is_cnf():
+        raise ValueError("la gramàtica probabilística no està en CNF (les gramàtiques amb probabilitats no es poden convertir)")
+    if cache_dir is not None:
+        cnf_grammar, parser = GrammarCache(cache_dir).get_parser(grammar, probabilistic, engine_class, converter)
+        return cnf_grammar, engine_class, parser
+    cnf_grammar = grammar if converter(grammar, prob=probabilistic).is_cnf() else converter(grammar, prob=probabilistic).converter()
+    return cnf_grammar, engine_class, engine_class(cnf_grammar)
+
+
+def read_words(file):
+    '''
+    Llegeix les paraules d'un fitxer (una per línia, una línia buida és la paraula buida) de manera mandrosa.
+    '''
+    for line in file:
+        yield line.rstrip('\r\n')
+
+
+def result_record(word, result, seconds, log=False):
+    '''
+    Construeix el registre JSON del resultat d'una paraula. Amb log, el resultat és la log-probabilitat de parse_log:
+    'log_probability' és exacta encara que 'probability' s'arrodoneixi a 0 per paraules llargues.
+
+    Paràmetres:
+        word (str): La paraula.
+        result (bool o float): El resultat de parse (True/False o la probabilitat/False) o, amb log, de parse_log.
+        seconds (float): Temps d'anàlisi (None si no s'ha mesurat).
+        log (bool): Si és True, result és una log-probabilitat (-inf si la paraula no pertany a la gramàtica).
+
+    Retorna:
+        dict: {'word', 'accepted', 'probability', 'log_probability', 'seconds'}.
+    '''
+    if log:
+        accepted = result > -math.inf
+        probability, log_probability = (math.exp(result), float(result)) if accepted else (None, None)
+    else:
+        accepted = bool(result)
+        probability = None if isinstance(result, bool) else float(result)
+        log_probability = math.log(probability) if probability else None
+    return {'word': word, 'accepted': accepted, 'probability': probability, 'log_probability': log_probability,
+            'seconds': seconds}
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description="Analitza paraules en lot amb l'algorisme CKY i escriu una línia JSON per paraula.")
+    arguments.add_argument('grammar', help="fitxer de gramàtica (binari o de text amb les regles)")
+    arguments.add_argument('words', nargs='?', default='-', help="fitxer amb una paraula per línia ('-' per llegir de l'entrada estàndard)")
+    arguments.add_argument('--engine', choices=sorted(ENGINES), help="analitzador (per defecte cky o probabilistic segons la gramàtica)")
+    arguments.add_argument('--workers', type=int, default=1, help="nombre de processos (per defecte 1)")
+    arguments.add_argument('--chunk-size', type=int, default=256, help="paraules per bloc enviat a un procés")
+    arguments.add_argument('--cache-dir', default='.cky_cache', help="directori de la cau de gramàtiques convertides")
+    arguments.add_argument('--no-cache', action='store_true', help="no fa servir la cau de gramàtiques")
+    arguments.add_argument('--no-timing', action='store_true', help="no mesura el temps de cada paraula (permet compartir prefixos)")
+    options = arguments.parse_intermixed_args(argv)
+
+    try:
+        cnf_grammar, engine_class, parser = build_parser(read_grammar(options.grammar), options.engine,
+                                                         None if options.no_cache else options.cache_dir)
+    except (OSError, SyntaxError, ValueError) as error:
+        arguments.error(f"no s'ha pogut carregar la gramàtica: {error}")
+    timed = not options.no_timing
+    log = hasattr(engine_class, 'parse_log')          # Els analitzadors probabilístics informen de la log-probabilitat
+    try:
+        words_file = sys.stdin if options.words == '-' else open(options.words, encoding='utf-8')
+    except OSError as error:
+        arguments.error(f"no s'ha pogut obrir el fitxer de paraules: {error}")
+    try:
+        with CorpusParser(cnf_grammar, engine=engine_class, workers=options.workers, chunk_size=options.chunk_size,
+                          min_parallel=options.chunk_size) as corpus_parser:
+            corpus_parser.parser = parser       # Es reutilitza l'analitzador ja construït (o llegit de la cau)
+            pending = deque()                   # Paraules llegides i encara sense resultat (els resultats arriben en ordre)
+
+            def remember(stream):
+                for word in stream:
+                    pending.append(word)
+                    yield word
+
+            for result in corpus_parser.parse(remember(read_words(words_file)), timed=timed, log=log):
+                result, seconds = result if timed else (result, None)
+                sys.stdout.write(json.dumps(result_record(pending.popleft(), result, seconds, log), ensure_ascii=False) + '\n')
+    finally:
+        if words_file is not sys.stdin:
+            words_file.close()
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import argparse
+import copy
+import json
+import math
+import os
+import random
+import sys
+import time
+from cky import CKY
+from cky_probabilistic import ProbabilisticCKY
+from converter import CNFConverter, FastCNFConverter
+from grammar_generator import GenerateGrammar
+from word_generator import LengthSampler
+
+
+def random_cfg(num_rules, num_non_terminals, seed=0):
+    """
+    Genera una gramàtica lliure de context aleatòria (no en CNF) per mesurar el temps de conversió.
+    Conté regles epsilon, regles unitàries, regles mixtes i regles llargues, i tots els no terminals són útils.
+
+    Paràmetres:
+        num_rules (int): Nombre de regles de la gramàtica.
+        num_non_terminals (int): Nombre de no terminals (N1, N2, ...).
+        seed (int): Llavor del generador aleatori.
+
+    Retorna:
+        list: Llista de regles (No terminal, [Body de la regla]).
+    """
+    rng = random.Random(seed)
+    non_terminals = [f"N{idx}" for idx in range(1, num_non_terminals + 1)]
+    terminals = [chr(code) for code in range(97, 123)]
+    grammar = [(non_terminal, [rng.choice(terminals)]) for non_terminal in non_terminals]    # Tots els no terminals generen alguna paraula
+    for idx in range(1, num_non_terminals):                                                # Tots els no terminals s'assoleixen des de N1
+        grammar.append((non_terminals[rng.randrange(idx)], [non_terminals[idx], rng.choice(terminals)]))
+    while len(grammar) < num_rules:
+        head = rng.choice(non_terminals)
+        kind = rng.random()
+        if kind < 0.02:
+            body = ['']                                                         # Regla epsilon
+        elif kind < 0.05:
+            body = [rng.choice(non_terminals)]                                  # Regla unitària
+        else:
+            body = [rng.choice(non_terminals) if rng.random() < 0.7 else rng.choice(terminals)
+                    for _ in range(rng.randint(2, 5))]                          # Regla mixta o llarga
+        grammar.append((head, body))
+    return grammar
+
+
+MIN_TIME = 0.05     # Durada mínima (en segons) de cada mostra; les crides més curtes es repeteixen dins la mostra
+TARGETS = {         # Sèrie -> (x, temps màxim en segons) que s'ha de complir sempre, amb referència o sense
+    'FastCNFConverter.converter/|G|': (5000, 1.0),      # Conversió de 5.000 regles en menys d'un segon
+}
+
+
+def benchmark_converter(num_rules, repeats=5, seed=0, converter=FastCNFConverter, min_time=MIN_TIME):
+    """
+    Mesura el temps que triga un convertidor a CNF a convertir una gramàtica aleatòria.
+
+    Paràmetres:
+        num_rules (int): Nombre de regles de la gramàtica.
+        repeats (int): Nombre mínim de repeticions (es retorna el millor temps).
+        seed (int): Llavor del generador aleatori.
+        converter (type): Classe del convertidor (per defecte FastCNFConverter).
+        min_time (float): Es continua repetint fins que el temps total mesurat arriba a aquest valor.
+
+    Retorna:
+        tuple: El millor temps en segons i el nombre de regles de la gramàtica en CNF.
+    """
+    grammar = random_cfg(num_rules, max(10, num_rules // 5), seed)
+    best, total, runs = float('inf'), 0.0, 0
+    while runs < repeats or total < min_time:    # Les conversions petites duren pocs ms: una sola mostra és soroll
+        runs += 1
+        rules = copy.deepcopy(grammar)
+        start = time.perf_counter()
+        cnf_grammar = converter(rules).converter()
+        elapsed = time.perf_counter() - start
+        best, total = min(best, elapsed), total + elapsed
+    return best, len(cnf_grammar)
+
+
+def time_call(function, repeats=5, warmup=1, min_time=MIN_TIME):
+    """
+    Mesura el temps d'una crida, com timeit: cada mostra repeteix la crida tantes vegades com cal perquè duri almenys
+    min_time segons, i es retorna el millor temps per crida de diverses mostres (després d'unes crides d'escalfament).
+
+    Paràmetres:
+        function (callable): La funció a cronometrar (sense paràmetres).
+        repeats (int): Nombre de mostres cronometrades.
+        warmup (int): Nombre de crides prèvies que no es cronometren.
+        min_time (float): Durada mínima de cada mostra en segons.
+
+    Retorna:
+        float: El millor temps per crida en segons.
+    """
+    for _ in range(warmup):
+        function()
+    number = 1
+    while True:                 # Nombre de crides per mostra (es dobla fins que la mostra dura prou)
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def fit_exponent(points):
+    """
+    Ajusta per mínims quadrats la recta log(t) = a + b log(x) i retorna el pendent b (t ~ x^b).
+
+    Paràmetres:
+        points (list): Llista de parells (x, temps) amb x i temps positius.
+
+    Retorna:
+        float: L'exponent ajustat, o None si hi ha menys de dos punts.
+    """
+    if len(points) < 2:
+        return None
+    xs = [math.log(x) for x, _ in points]
+    ys = [math.log(max(t, 1e-9)) for _, t in points]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance if variance else None
+
+
+def parse_inputs(num_rules, length, probabilistic=False, seed=0):
+    """
+    Genera de manera reproduïble una gramàtica en CNF de la mida donada i una paraula de la gramàtica de longitud exacta.
+
+    Paràmetres:
+        num_rules (int): Nombre de regles de la gramàtica.
+        length (int): Longitud de la paraula.
+        probabilistic (bool): Indica si la gramàtica és probabilística o no.
+        seed (int): Llavor del generador aleatori.
+
+    Retorna:
+        tuple: La gramàtica i la paraula (None si la gramàtica no genera cap paraula d'aquesta longitud).
+    """
+    random.seed(seed)
+    grammar = GenerateGrammar().generate_large_grammar(max(10, num_rules // 10), num_rules, 8, 0.5, cnf=True,
+                                                       probabilistic=probabilistic, recursive=True)
+    return grammar, LengthSampler(grammar, probabilistic, max_length=length).sample(length)
+
+
+def benchmark_parser(engine, probabilistic, lengths, sizes, fixed_size, fixed_length, repeats=5, seed=0):
+    """
+    Mesura el temps de parse d'un analitzador variant la longitud de la paraula (amb la mida de la gramàtica fixa)
+    i la mida de la gramàtica (amb la longitud fixa).
+
+    Paràmetres:
+        engine (type): Classe de l'analitzador (CKY, ProbabilisticCKY...).
+        probabilistic (bool): Indica si l'analitzador fa servir gramàtiques probabilístiques.
+        lengths (list): Longituds de paraula a provar.
+        sizes (list): Mides de gramàtica (nombre de regles) a provar.
+        fixed_size (int): Mida de la gramàtica quan es varia la longitud.
+        fixed_length (int): Longitud de la paraula quan es varia la mida de la gramàtica.
+        repeats (int): Nombre de mostres de cada mesura (vegeu time_call).
+        seed (int): Llavor del generador aleatori.
+
+    Retorna:
+        dict: {'length': [(n, temps)], 'size': [(|G|, temps)]}.
+    """
+    results = {'length': [], 'size': []}
+    for kind, points in (('length', [(fixed_size, n) for n in lengths]), ('size', [(size, fixed_length) for size in sizes])):
+        for num_rules, length in points:
+            grammar, word = parse_inputs(num_rules, length, probabilistic, seed)
+            if word is None:            # La gramàtica no genera cap paraula d'aquesta longitud
+                continue
+            parser = engine(grammar)
+            results[kind].append((length if kind == 'length' else num_rules, time_call(lambda: parser.parse(word), repeats)))
+    return results
+
+
+def run_suite(quick=False, repeats=5, seed=0):
+    """
+    Executa tot el joc de benchmarks: CKY i ProbabilisticCKY (variant n i |G|) i els convertidors a CNF (variant |G|).
+
+    Paràmetres:
+        quick (bool): Fa servir mides més petites (per a una comprovació ràpida).
+        repeats (int): Nombre de repeticions de cada mesura.
+        seed (int): Llavor del generador aleatori.
+
+    Retorna:
+        dict: nom de la sèrie -> {'points': [[x, temps], ...], 'exponent': exponent ajustat}.
+    """
+    lengths = (8, 16, 32) if quick else (8, 16, 24, 32, 48)
+    sizes = (100, 200, 400) if quick else (125, 250, 500, 1000)
+    fixed_size, fixed_length = (200, 12) if quick else (250, 16)
+    converter_sizes = (100, 200, 400) if quick else (250, 500, 1000, 2000)
+    fast_converter_sizes = converter_sizes if quick else converter_sizes + (5000,)     # CNFConverter tarda uns 10 s amb 5.000 regles
+    series = {}
+    for name, engine, probabilistic in (('CKY', CKY, False), ('ProbabilisticCKY', ProbabilisticCKY, True)):
+        results = benchmark_parser(engine, probabilistic, lengths, sizes, fixed_size, fixed_length, repeats, seed)
+        series[f"{name}.parse/n"] = results['length']
+        series[f"{name}.parse/|G|"] = results['size']
+    for converter, converter_points in ((CNFConverter, converter_sizes), (FastCNFConverter, fast_converter_sizes)):
+        series[f"{converter.__name__}.converter/|G|"] = [(size, benchmark_converter(size, repeats, seed, converter)[0])
+                                                         for size in converter_points]
+    return {name: {'points': [list(point) for point in points], 'exponent': fit_exponent(points)}
+            for name, points in series.items()}
+
+
+def best_of(results, other):
+    """
+    Combina dues execucions de run_suite quedant-se amb el millor temps de cada punt.
+
+    Paràmetres:
+        results (dict): Resultats de run_suite.
+        other (dict): Resultats d'una altra execució (amb el mateix format).
+
+    Retorna:
+        dict: Els resultats combinats, amb els exponents tornats a ajustar.
+    """
+    combined = {}
+    for name, result in results.items():
+        others = {x: t for x, t in other.get(name, {}).get('points', [])}
+        points = [(x, min(seconds, others.get(x, seconds))) for x, seconds in result['points']]
+        combined[name] = {'points': [list(point) for point in points], 'exponent': fit_exponent(points)}
+    return combined
+
+
+def check_targets(results, targets=TARGETS):
+    """
+    Comprova els objectius de temps absoluts (vegeu TARGETS) dels punts que s'han mesurat.
+
+    Paràmetres:
+        results (dict): Resultats de run_suite.
+        targets (dict): Sèrie -> (x, temps màxim en segons).
+
+    Retorna:
+        list: Missatges dels objectius que no es compleixen (buida si es compleixen tots).
+    """
+    missed = []
+    for name, (x, limit) in targets.items():
+        for point, seconds in results.get(name, {}).get('points', []):
+            if point == x and seconds > limit:
+                missed.append(f"{name} x={x}: {seconds:.4f} s (objectiu {limit:.4f} s)")
+    return missed
+
+
+def compare(results, baseline, tolerance=1.5):
+    """
+    Compara els temps amb els d'una execució de referència.
+
+    Paràmetres:
+        results (dict): Resultats de run_suite.
+        baseline (dict): Resultats de referència (amb el mateix format).
+        tolerance (float): Factor màxim permès respecte al temps de referència.
+
+    Retorna:
+        list: Missatges de les mesures que han empitjorat més del permès (buida si no n'hi ha cap).
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = {x: t for x, t in baseline.get(name, {}).get('points', [])}
+        for x, seconds in result['points']:
+            if x in reference and seconds > tolerance * reference[x]:
+                regressions.append(f"{name} x={x}: {seconds:.4f} s (referència {reference[x]:.4f} s, x{seconds / reference[x]:.2f})")
+    return regressions
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Benchmarks d'escalat dels analitzadors CKY i dels convertidors a CNF.")
+    arguments.add_argument('--baseline', default=os.path.join('.benchmarks', 'baseline.json'),
+                           help="fitxer JSON amb els temps de referència (per defecte en un directori ignorat per git, perquè depèn de la màquina)")
+    arguments.add_argument('--save-baseline', action='store_true', help="guarda els resultats com a nova referència")
+    arguments.add_argument('--tolerance', type=float, default=1.5, help="factor màxim permès respecte a la referència")
+    arguments.add_argument('--retries', type=int, default=2, help="cops que es torna a mesurar tot abans de donar una regressió per bona")
+    arguments.add_argument('--repeats', type=int, default=5, help="mostres de cada mesura (cada mostra dura almenys 50 ms)")
+    arguments.add_argument('--seed', type=int, default=0, help="llavor del generador aleatori")
+    arguments.add_argument('--quick', action='store_true', help="mides petites, per a una comprovació ràpida")
+    options = arguments.parse_args()
+
+    results = run_suite(options.quick, options.repeats, options.seed)
+    for name, result in results.items():
+        points = ', '.join(f"{x}: {seconds * 1000:.2f} ms" for x, seconds in result['points'])
+        exponent = f"{result['exponent']:.2f}" if result['exponent'] is not None else '-'
+        print(f"{name:<32} exponent {exponent:>5}   {points}")
+    missed = check_targets(results)
+    for message in missed:
+        print(f"Objectiu no assolit: {message}")
+
+    if options.save_baseline:
+        os.makedirs(os.path.dirname(options.baseline) or '.', exist_ok=True)
+        with open(options.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"S'han guardat els resultats a {options.baseline}")
+    elif os.path.exists(options.baseline):
+        with open(options.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, options.tolerance)
+        for _ in range(options.retries):
+            if not regressions:
+                break
+            print(f"{len(regressions)} mesures per sobre de la tolerància; es torna a mesurar")
+            results = best_of(results, run_suite(options.quick, options.repeats, options.seed))
+            regressions = compare(results, baseline, options.tolerance)
+        for message in regressions:
+            print(f"Regressió: {message}")
+        if regressions:
+            sys.exit(1)
+        print(f"Cap regressió respecte a {options.baseline} (tolerància x{options.tolerance})")
+    else:
+        print(f"No hi ha temps de referència ({options.baseline}); fes servir --save-baseline per crear-los")
+    if missed:
+        sys.exit(1)
@@ -0,0 +1,125 @@
+import sys
+from collections import OrderedDict
+
+
+class Chart:
+
+    def __init__(self, n=0, cell_type=set):
+        """
+        Inicialitza la classe. Guarda només les n(n+1)/2 caselles vàlides (i, j) amb i < j de la taula CKY en una sola
+        llista, ordenades per columnes: la casella (i, j) és a la posició offsets[j] + i. Com que l'ordre és per columnes,
+        la taula pot créixer i decréixer per la dreta (paraules que comparteixen prefix, lectura caràcter a caràcter).
+
+        Les caselles buides comparteixen un sol objecte (empty), així que no s'ha de modificar cap casella
+        obtinguda de la taula: cada casella es calcula a part i es guarda un cop acabada.
+
+        Paràmetres:
+            n (int): Nombre inicial de columnes (longitud de la paraula).
+            cell_type (type): Tipus de les caselles (set, dict, int...); cell_type() és la casella buida.
+        """
+        self.cell_type = cell_type
+        self.empty = cell_type()        # Casella buida compartida per totes les caselles sense contingut
+        self.n = 0
+        self.cells = []                 # Llista plana de caselles
+        self.offsets = [0]              # offsets[j] és la posició de la casella (0, j)
+        for _ in range(n):
+            self.add_column()
+
+
+    def __len__(self):
+        return self.n
+
+
+    def __getitem__(self, span):
+        i, j = span
+        return self.cells[self.offsets[j] + i]
+
+
+    def __setitem__(self, span, cell):
+        i, j = span
+        self.cells[self.offsets[j] + i] = cell
+
+
+    def add_column(self):
+        '''
+        Afegeix una columna buida a la dreta de la taula (les caselles (i, n+1) amb i <= n).
+        '''
+        self.n += 1
+        self.offsets.append(len(self.cells))
+        self.cells.extend([self.empty] * self.n)
+
+
+    def truncate(self, n):
+        '''
+        Descarta les columnes posteriors a n i conserva les caselles (i, j) amb j <= n.
+
+        Paràmetres:
+            n (int): Nombre de columnes que es conserven.
+        '''
+        if n < self.n:
+            del self.cells[n * (n + 1) // 2:]
+            del self.offsets[n + 1:]
+            self.n = n
+
+
+
+class SubstringCache:
+
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        """
+        Inicialitza la classe. Cau LRU de caselles de la taula CKY indexada per la subparaula: el contingut de la casella
+        (i, j) només depèn de word[i:j], així que es pot reutilitzar entre paraules diferents que comparteixen subparaules
+        (no només prefixos). Quan la mida estimada supera max_bytes, s'eliminen les entrades menys usades recentment.
+        Les caselles són de la gramàtica de l'analitzador que les ha calculat, així que cada analitzador té la seva cau.
+
+        Paràmetres:
+            max_bytes (int): Mida màxima estimada de la cau en bytes (per defecte 64 MiB).
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()    # Subparaula -> (casella, mida estimada), de la menys a la més usada recentment
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def get(self, substring):
+        '''
+        Retorna la casella d'una subparaula i en marca l'ús, o None si no és a la cau.
+        '''
+        entry = self.entries.get(substring)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(substring)
+        self.hits += 1
+        return entry[0]
+
+
+    def put(self, substring, cell):
+        '''
+        Guarda la casella d'una subparaula i elimina les entrades menys usades recentment fins que la mida és com a màxim max_bytes.
+        '''
+        if substring in self.entries:
+            self.size -= self.entries.pop(substring)[1]
+        size = sys.getsizeof(substring) + sys.getsizeof(cell) + 100     # Els símbols de la casella són compartits; 100 bytes per l'entrada del diccionari
+        self.entries[substring] = (cell, size)
+        self.size += size
+        while self.size > self.max_bytes and self.entries:
+            self.size -= self.entries.popitem(last=False)[1][1]
+
+
+    def hit_rate(self):
+        '''
+        Retorna la proporció de consultes que s'han trobat a la cau (0 si encara no se n'ha fet cap).
+        '''
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
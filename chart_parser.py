@@ -0,0 +1,190 @@
+import time
+from functools import partial
+from chart import Chart
+from parse_stats import ParseStats
+
+
+class ChartParser:
+    '''
+    Part comuna de CKY i ProbabilisticCKY: el recorregut de la taula (parse, parse_many), la cau de subparaules i
+    les mesures. Les subclasses hi afegeixen el tipus de les caselles (cell_type), el càlcul d'una casella (fill_cell,
+    i fill_cell_counted quan es recullen mesures) i el resultat de la paraula buida (empty_word_result) i de la
+    casella (0, n) (result). Fan servir els atributs lexicon, word_filter i cache que creen els seus constructors.
+    '''
+
+    cell_type = set     # Tipus de les caselles de la taula (vegeu chart.Chart)
+
+
+    def empty_word_result(self):
+        '''
+        Retorna el resultat de la paraula buida quan passa el filtre (el símbol inicial genera epsilon).
+        '''
+        raise NotImplementedError
+
+
+    def result(self, cell):
+        '''
+        Retorna el resultat de la paraula a partir de la casella (0, n) de la taula.
+
+        Paràmetres:
+            cell: La casella (0, n).
+        '''
+        raise NotImplementedError
+
+
+    def fill_cell(self, table, word, i, j):
+        '''
+        Calcula la casella (i, j) a partir de les caselles (i, k) i (k, j), que ja han d'estar calculades.
+        '''
+        raise NotImplementedError
+
+
+    def fill_cell_counted(self, table, word, i, j, stats):
+        '''
+        Com fill_cell, però a més compta les consultes a l'índex de regles i les regles aplicades i actualitza stats.
+        '''
+        raise NotImplementedError
+
+
+    def parse(self, word, stats=None):
+        '''
+        Analitza una paraula amb l'algorisme CKY.
+
+        Paràmetres:
+            word (str): La palabra a analitzar.
+            stats (ParseStats): Si es dona, s'hi guarden les mesures de l'anàlisi (per defecte no se'n recull cap).
+
+        Retorna:
+            El resultat de result per a la casella (0, n) (o de empty_word_result per a la paraula buida), o False si
+            la paraula no pertany a la gramàtica.
+        '''
+        if stats is not None:
+            stats.length = len(word)
+        if not self.word_filter.accepts(word):      # Descarta en temps lineal les paraules que no poden pertànyer al llenguatge
+            if stats is not None:
+                stats.filtered = True
+            return False
+        if not word:                                # La paraula buida només passa el filtre si el símbol inicial genera epsilon
+            return self.empty_word_result()
+
+        n = len(word)         # Longitud de la paraula
+
+        # Inicialitza la taula CKY (només les n(n+1)/2 caselles (i, j) amb i < j)
+        table = Chart(n, self.cell_type)
+
+        # Amb mesures es fa servir la variant de fill_cell que compta (es tria un sol cop, així sense mesures no hi ha cap cost)
+        fill_cell = self.fill_cell if stats is None else partial(self.fill_cell_counted, stats=stats)
+        if self.cache is not None:
+            fill_cell = partial(self.fill_cell_cached, fill_cell=fill_cell, stats=stats)
+
+        # Omple la diagonal de la taula amb els símbols terminals
+        if stats is not None:
+            started = time.perf_counter()
+        for i in range(n):
+            table[i, i+1] = self.lexicon.get(word[i], table.empty)
+        if stats is not None:
+            for i in range(n):
+                stats.add_cell(table[i, i+1])
+            stats.time_per_length[1] = time.perf_counter() - started
+
+        # Omple la resta de la taula
+        for l in range(2, n+1):
+            if stats is not None:
+                started = time.perf_counter()
+            for i in range(n-l+1):
+                table[i, i+l] = fill_cell(table, word, i, i+l)
+            if stats is not None:
+                stats.time_per_length[l] = time.perf_counter() - started
+
+        return self.result(table[0, n])
+
+
+    def fill_cell_cached(self, table, word, i, j, fill_cell, stats=None):
+        '''
+        Obté la casella (i, j) de la cau de subparaules si word[i:j] ja s'havia analitzat; si no, la calcula amb fill_cell i la guarda.
+
+        Paràmetres:
+            table (Chart): La taula CKY.
+            word (str): La paraula a analitzar.
+            i (int): Inici de l'interval.
+            j (int): Final de l'interval.
+            fill_cell (callable): La funció que calcula la casella (fill_cell o fill_cell_counted).
+            stats (ParseStats): Si es dona, s'hi compten les caselles obtingudes de la cau.
+
+        Retorna:
+            La casella (i, j), del tipus cell_type (o la casella buida de la taula).
+        '''
+        substring = word[i:j]
+        cell = self.cache.get(substring)
+        if cell is None:
+            cell = fill_cell(table, word, i, j)
+            self.cache.put(substring, cell)
+        elif stats is not None:
+            stats.cache_hits += 1
+            stats.add_cell(cell)
+        return cell
+
+
+    def parse_with_stats(self, word):
+        '''
+        Analitza la paraula recollint les mesures de l'anàlisi.
+
+        Paràmetres:
+            word (str): La paraula a analitzar.
+
+        Retorna:
+            tuple: El resultat de parse i l'objecte ParseStats amb les mesures.
+        '''
+        stats = ParseStats()
+        return self.parse(word, stats), stats
+
+
+    def fill_column(self, table, word, j):
+        '''
+        Calcula la columna j de la taula, és a dir, totes les caselles (i, j) amb i < j. Només depèn de word[:j]
+        i de les columnes anteriors, de manera que es pot reutilitzar per a totes les paraules amb el mateix prefix.
+
+        Paràmetres:
+            table (Chart): La taula CKY, amb les columnes anteriors calculades i com a mínim j columnes.
+            word (str): La paraula a analitzar (com a mínim de longitud j).
+            j (int): Índex de la columna a calcular.
+        '''
+        fill_cell = self.fill_cell if self.cache is None else partial(self.fill_cell_cached, fill_cell=self.fill_cell)
+        table[j-1, j] = self.lexicon.get(word[j-1], table.empty)   # Casella de la diagonal
+        for i in range(j-2, -1, -1):                                # De baix a dalt, així les caselles (k, j) amb k > i ja estan calculades
+            table[i, j] = fill_cell(table, word, i, j)
+
+
+    def parse_many(self, words):
+        '''
+        Analitza cada paraula d'una llista.
+        Les paraules es recorren en ordre lexicogràfic (com un recorregut d'un arbre de prefixos) i les columnes
+        de la taula que corresponen al prefix comú amb la paraula anterior es reutilitzen en lloc de tornar-se a calcular.
+
+        Paràmetres:
+            words (list): Les paraules a analitzar.
+
+        Retorna:
+            list: Els resultats de parse en el mateix ordre que les paraules d'entrada.
+        '''
+        results = [False] * len(words)
+        table = Chart(0, self.cell_type)    # Taula de la paraula actual; les columnes del prefix comú es conserven
+        previous = ''
+        for idx in sorted(range(len(words)), key=words.__getitem__):
+            word = words[idx]
+            if not word:                                                # La paraula buida no necessita taula
+                results[idx] = self.parse(word)
+                continue
+            if not self.word_filter.accepts(word):                      # Les paraules descartades pel filtre no modifiquen les columnes
+                continue
+            common = 0                                                  # Longitud del prefix comú amb la paraula anterior
+            limit = min(len(word), len(previous))
+            while common < limit and word[common] == previous[common]:
+                common += 1
+            table.truncate(common)                                      # Descarta les columnes que ja no són vàlides
+            for j in range(common+1, len(word)+1):
+                table.add_column()
+                self.fill_column(table, word, j)
+            results[idx] = self.result(table[0, len(word)])
+            previous = word
+        return results
@@ -1,50 +1,470 @@
-class CKY:
-
-    def __init__(self, grammar):
-        """
-        Inicialitza la classe.
-
-        Paràmetres:
-            grammar (list): La gramàtica en forma de llista de tuples on cada tupla és una regla.
-                            Cada regla és de la forma (No terminal, [Body de la regla]).
-        """
-        self.grammar = grammar  # Assigna la gramàtica proporcionada a l'atribut de la classe
-
-
-    def parse(self, word):
-        '''
-        Comprova si una paraula pertany al llenguatge de la gramàtica.
-
-        Paràmetres:
-            word (str): La palabra a analitzar.
-
-        Retorna:
-            bool: True si la palabra es acceptada per la gramàtica, False en cas contrari.
-        '''
-        n = len(word)         # Longitud de la paraula
-
-        # Inicialitza la taula CKY de mida (n+1) x (n+1)
-        table = [[set() for _ in range(n+1)] for _ in range(n)] 
-        
-        # Omple la diagonal de la taula amb els símbols terminals
-        for i in range(n):
-            for rule in self.grammar:
-                if len(rule[1]) == 1 and rule[1][0] == word[i]:
-                    table[i][i+1].add(rule[0])
-   
-        # Omple la resta de la taula
-        for l in range(2, n+1):
-            for i in range(n-l+1):
-                j = i + l
-                for k in range(i+1, j):
-                    for rule in self.grammar:
-                        if len(rule[1]) == 2:
-                            non_terminal, head, body = rule[0], rule[1][0], rule[1][1]
-                            if head in table[i][k] and body in table[k][j]:
-                                table[i][j].add(non_terminal)
-        
-        # Comprovar si el símbol inicial es troba a la casella (0, n)
-        return self.grammar[0][0] in table[0][n]
-    
-
-
+from collections import defaultdict
+import time
+from chart import Chart, SubstringCache
+from chart_parser import ChartParser
+from grammar_analysis import WordFilter, boundary_children, generating_symbols
+from grammar_file import GrammarFile
+
+
+class CKY(ChartParser):
+
+    cell_type = set     # Cada casella és el conjunt de no terminals que generen la subparaula
+
+
+    def __init__(self, grammar, cache_bytes=None, indexes=None):
+        """
+        Inicialitza la classe.
+
+        Paràmetres:
+            grammar (list): La gramàtica en forma de llista de tuples on cada tupla és una regla.
+                            Cada regla és de la forma (No terminal, [Body de la regla]).
+            cache_bytes (int): Si es dona, les caselles es guarden en una cau LRU de subparaules d'aquesta mida màxima
+                               (vegeu chart.SubstringCache) i es reutilitzen entre crides a parse (per defecte no n'hi ha).
+            indexes (tuple): Índexs ja compilats per compile_grammar (per exemple, llegits de GrammarCache); si no es donen, es compilen.
+        """
+        self.grammar = grammar  # Assigna la gramàtica proporcionada a l'atribut de la classe
+        self.cache = SubstringCache(cache_bytes) if cache_bytes else None  # Cau de caselles per subparaula, compartida per totes les paraules
+        self.lexicon, self.binary_rules = indexes if indexes is not None else self.compile_grammar()  # Índexs que fa servir el mètode parse
+        if isinstance(self.grammar, GrammarFile):   # El fitxer ja conté l'anàlisi de la gramàtica
+            self.word_filter = self.grammar.word_filter()
+            self.left_children, self.right_children = self.grammar.boundary_children()
+        else:
+            self.word_filter = WordFilter(self.grammar, self.grammar[0][0])  # Condicions necessàries que es comproven abans de construir la taula
+            self.left_children, self.right_children = boundary_children(self.grammar)  # Terminal de la frontera -> fills que cal provar
+
+
+    @classmethod
+    def from_file(cls, path):
+        '''
+        Crea l'analitzador a partir d'un fitxer binari de gramàtica (vegeu grammar_file.write_grammar), obert amb mmap.
+
+        Paràmetres:
+            path (str): Ruta del fitxer.
+
+        Retorna:
+            CKY: L'analitzador (de la classe des de la qual es crida).
+        '''
+        grammar = GrammarFile(path)
+        if grammar.probabilistic:
+            raise ValueError(f"{path} conté una gramàtica probabilística (fes servir ProbabilisticCKY.from_file)")
+        return cls(grammar)
+
+
+    def compile_grammar(self):
+        '''
+        Compila la gramàtica en dos índexs per evitar recórrer totes les regles a cada casella de la taula.
+
+        Retorna:
+            tuple: Un diccionari terminal -> {heads} amb les regles terminals i un diccionari (B, C) -> {A} amb les regles binàries.
+        '''
+        lexicon = defaultdict(set)          # terminal -> conjunt de no terminals que el generen
+        binary_rules = defaultdict(set)     # (B, C) -> conjunt de no terminals A amb la regla A -> B C
+        if isinstance(self.grammar, GrammarFile):       # Es llegeixen directament els arrays d'enters del fitxer
+            symbols = self.grammar.symbols
+            for head, left, right in zip(self.grammar.heads, self.grammar.lefts, self.grammar.rights):
+                if right < 0:
+                    lexicon[symbols[left]].add(symbols[head])
+                else:
+                    binary_rules[(symbols[left], symbols[right])].add(symbols[head])
+        else:
+            for head, body in self.grammar:
+                if len(body) == 1:
+                    lexicon[body[0]].add(head)
+                elif len(body) == 2:
+                    binary_rules[(body[0], body[1])].add(head)
+        # Els conjunts es guarden directament a les caselles de la taula, així que no han de ser modificables
+        return ({terminal: frozenset(heads) for terminal, heads in lexicon.items()},
+                {pair: frozenset(heads) for pair, heads in binary_rules.items()})
+
+
+    def empty_word_result(self):
+        '''
+        Retorna el resultat de parse per a la paraula buida quan passa el filtre.
+
+        Retorna:
+            bool: True (el filtre només accepta la paraula buida si el símbol inicial genera epsilon).
+        '''
+        return True
+
+
+    def result(self, cell):
+        '''
+        Comprova si el símbol inicial es troba a la casella (0, n).
+
+        Paràmetres:
+            cell (set): La casella (0, n) de la taula.
+
+        Retorna:
+            bool: True si la palabra es acceptada per la gramàtica, False en cas contrari.
+        '''
+        return self.grammar[0][0] in cell
+
+
+    def fill_cell(self, table, word, i, j):
+        '''
+        Calcula la casella (i, j) a partir de les caselles (i, k) i (k, j), que ja han d'estar calculades.
+        Només es proven les parelles de símbols presents a les dues caselles, i d'aquestes només els B que poden anar
+        seguits d'un no terminal que comenci per word[k] i els C que poden anar precedits d'un que acabi per word[k-1].
+
+        Paràmetres:
+            table (Chart): La taula CKY.
+            word (str): La paraula a analitzar.
+            i (int): Inici de l'interval.
+            j (int): Final de l'interval.
+
+        Retorna:
+            set: Els no terminals que generen word[i:j] (o la casella buida de la taula).
+        '''
+        binary_rules = self.binary_rules
+        left_children, right_children = self.left_children, self.right_children
+        cells, offsets = table.cells, table.offsets
+        cell = set()
+        column = offsets[j]
+        for k in range(i+1, j):
+            left = cells[offsets[k] + i]
+            if not left:
+                continue
+            right = cells[column + k]
+            if not right:
+                continue
+            allowed = left_children.get(word[k])
+            if allowed is not None:
+                left = left & allowed
+                if not left:
+                    continue
+            allowed = right_children.get(word[k-1])
+            if allowed is not None:
+                right = right & allowed
+                if not right:
+                    continue
+            for B in left:
+                for C in right:
+                    heads = binary_rules.get((B, C))
+                    if heads:
+                        cell.update(heads)
+        return cell or table.empty
+
+
+    def fill_cell_counted(self, table, word, i, j, stats):
+        '''
+        Com fill_cell, però a més compta les consultes a l'índex de regles i les regles aplicades i actualitza stats.
+
+        Paràmetres:
+            table (Chart): La taula CKY.
+            word (str): La paraula a analitzar.
+            i (int): Inici de l'interval.
+            j (int): Final de l'interval.
+            stats (ParseStats): On es guarden les mesures.
+
+        Retorna:
+            set: Els no terminals que generen word[i:j] (o la casella buida de la taula).
+        '''
+        binary_rules = self.binary_rules
+        left_children, right_children = self.left_children, self.right_children
+        cells, offsets = table.cells, table.offsets
+        cell = set()
+        column = offsets[j]
+        probes = matches = 0
+        for k in range(i+1, j):
+            left = cells[offsets[k] + i]
+            if not left:
+                continue
+            right = cells[column + k]
+            if not right:
+                continue
+            allowed = left_children.get(word[k])
+            if allowed is not None:
+                left = left & allowed
+                if not left:
+                    continue
+            allowed = right_children.get(word[k-1])
+            if allowed is not None:
+                right = right & allowed
+                if not right:
+                    continue
+            probes += len(left) * len(right)
+            for B in left:
+                for C in right:
+                    heads = binary_rules.get((B, C))
+                    if heads:
+                        matches += len(heads)
+                        cell.update(heads)
+        stats.probes += probes
+        stats.matches += matches
+        stats.add_cell(cell)
+        return cell or table.empty
+
+
+
+class BitsetCKY(CKY):
+
+    def __init__(self, grammar, indexes=None):
+        """
+        Inicialitza la classe. Cada no terminal s'associa a una posició de bit i cada casella de la taula és un sol int.
+
+        Paràmetres:
+            grammar (list): La gramàtica en forma de llista de tuples on cada tupla és una regla.
+                            Cada regla és de la forma (No terminal, [Body de la regla]).
+            indexes (tuple): Índexs ja compilats per compile_grammar (per exemple, llegits de GrammarCache); si no es donen, es compilen.
+        """
+        super().__init__(grammar, indexes=indexes)
+        self.symbols, self.bits = self.intern_symbols()                         # Llista de no terminals i diccionari no terminal -> posició de bit
+        self.lexicon_masks, self.binary_masks = self.compile_masks()           # Índexs compilats en forma de màscares de bits
+        self.left_mask = 0                                                      # Màscara dels símbols que apareixen com a fill esquerre d'alguna regla
+        for B in self.binary_masks:
+            self.left_mask |= 1 << B
+        # Terminal de la frontera -> màscara dels fills esquerres i dels fills drets que cal provar (vegeu CKY.fill_cell)
+        self.left_children_masks = {terminal: self.mask(children) if children is not None else self.left_mask
+                                    for terminal, children in self.left_children.items()}
+        self.right_children_masks = {terminal: self.mask(children) if children is not None else -1
+                                     for terminal, children in self.right_children.items()}
+
+
+    def mask(self, symbols):
+        '''
+        Retorna la màscara de bits d'un conjunt de no terminals (els que no surten a la gramàtica s'ignoren).
+        '''
+        mask = 0
+        for symbol in symbols:
+            if symbol in self.bits:
+                mask |= 1 << self.bits[symbol]
+        return mask
+
+
+    def intern_symbols(self):
+        '''
+        Assigna una posició de bit a cada no terminal de la gramàtica (en ordre d'aparició).
+
+        Retorna:
+            tuple: La llista de no terminals i un diccionari no terminal -> posició de bit.
+        '''
+        bits = {}
+        for head, body in self.grammar:
+            for symbol in [head] + (list(body) if len(body) == 2 else []):
+                if symbol not in bits:
+                    bits[symbol] = len(bits)
+        return list(bits), bits
+
+
+    def compile_masks(self):
+        '''
+        Converteix els índexs de la classe CKY en màscares de bits.
+
+        Retorna:
+            tuple: Un diccionari terminal -> màscara de heads i un diccionari B -> llista de (màscara de C, bit de A),
+                   de manera que A -> B C es pot aplicar si la casella dreta té algun bit de la màscara de C.
+        '''
+        bits = self.bits
+        lexicon_masks = {}
+        for terminal, heads in self.lexicon.items():
+            mask = 0
+            for head in heads:
+                mask |= 1 << bits[head]
+            lexicon_masks[terminal] = mask
+
+        grouped = defaultdict(lambda: defaultdict(int))     # B -> A -> màscara de tots els C amb A -> B C
+        for (B, C), heads in self.binary_rules.items():
+            for A in heads:
+                grouped[bits[B]][1 << bits[A]] |= 1 << bits[C]
+        binary_masks = {B: [(c_mask, a_mask) for a_mask, c_mask in groups.items()] for B, groups in grouped.items()}
+        return lexicon_masks, binary_masks
+
+
+    def parse(self, word, stats=None):
+        '''
+        Comprova si una paraula pertany al llenguatge de la gramàtica fent servir caselles de bits.
+        Retorna exactament el mateix resultat que CKY.parse.
+
+        Paràmetres:
+            word (str): La palabra a analitzar.
+            stats (ParseStats): Si es dona, s'hi guarden les mesures de l'anàlisi (les consultes són les parelles de bits
+                                (B, C) provades i les regles aplicades es compten per cada A -> B C).
+
+        Retorna:
+            bool: True si la palabra es acceptada per la gramàtica, False en cas contrari.
+        '''
+        if stats is not None:
+            stats.length = len(word)
+        if not self.word_filter.accepts(word):      # Descarta en temps lineal les paraules que no poden pertànyer al llenguatge
+            if stats is not None:
+                stats.filtered = True
+            return False
+        if not word:                                # La paraula buida només passa el filtre si el símbol inicial genera epsilon
+            return True
+
+        n = len(word)
+        # Per a cada punt de tall k, màscares dels B de la casella esquerra i dels C de la dreta que poden formar alguna regla
+        left_masks = [self.left_children_masks.get(char, self.left_mask) for char in word]
+        right_masks = [self.right_children_masks.get(char, -1) for char in word]
+
+        # Inicialitza la taula amb una màscara buida (0) per casella (només les caselles (i, j) amb i < j)
+        table = Chart(n, int)
+
+        # Omple la diagonal de la taula amb els símbols terminals
+        if stats is not None:
+            started = time.perf_counter()
+        for i in range(n):
+            table[i, i+1] = self.lexicon_masks.get(word[i], 0)
+        if stats is not None:
+            for i in range(n):
+                stats.add_cell_size(table[i, i+1].bit_count())
+            stats.time_per_length[1] = time.perf_counter() - started
+
+        # Omple la resta de la taula (amb mesures, amb la variant que compta: es tria un sol cop, així sense mesures no hi ha cap cost)
+        if stats is None:
+            self.fill_masks(table, left_masks, right_masks)
+        else:
+            self.fill_masks_counted(table, left_masks, right_masks, stats)
+
+        # Comprovar si el símbol inicial es troba a la casella (0, n)
+        return bool(table[0, n] >> self.bits[self.grammar[0][0]] & 1)
+
+
+    def fill_masks(self, table, left_masks, right_masks):
+        '''
+        Omple les caselles (i, j) amb j - i >= 2 de la taula de bits, diagonal a diagonal, recorrent només els bits de la
+        casella esquerra que poden ser fill esquerre davant de word[k].
+
+        Paràmetres:
+            table (Chart): La taula de bits, amb la diagonal ja calculada.
+            left_masks (list): Per a cada posició k, màscara dels B que poden anar seguits de word[k].
+            right_masks (list): Per a cada posició k, màscara dels C que poden anar precedits de word[k].
+        '''
+        binary_masks = self.binary_masks
+        cells, offsets = table.cells, table.offsets
+        n = len(table)
+        for l in range(2, n+1):
+            for i in range(n-l+1):
+                j = i + l
+                cell = 0
+                for k in range(i+1, j):
+                    left, right = cells[offsets[k] + i] & left_masks[k], cells[offsets[j] + k] & right_masks[k-1]
+                    if not left or not right:
+                        continue
+                    while left:
+                        low = left & -left                              # Bit menys significatiu de la casella esquerra
+                        left ^= low
+                        for c_mask, a_mask in binary_masks[low.bit_length() - 1]:
+                            if right & c_mask:
+                                cell |= a_mask
+                table[i, j] = cell
+
+
+    def fill_masks_counted(self, table, left_masks, right_masks, stats):
+        '''
+        Com fill_masks, però a més guarda a stats el temps de cada diagonal, la mida de cada casella, les parelles de
+        bits (B, C) provades i les regles A -> B C aplicades.
+
+        Paràmetres:
+            table (Chart): La taula de bits, amb la diagonal ja calculada.
+            left_masks (list): Per a cada posició k, màscara dels B que poden anar seguits de word[k].
+            right_masks (list): Per a cada posició k, màscara dels C que poden anar precedits de word[k].
+            stats (ParseStats): On es guarden les mesures.
+        '''
+        binary_masks = self.binary_masks
+        cells, offsets = table.cells, table.offsets
+        n = len(table)
+        for l in range(2, n+1):
+            started = time.perf_counter()
+            probes = matches = 0
+            for i in range(n-l+1):
+                j = i + l
+                cell = 0
+                for k in range(i+1, j):
+                    left, right = cells[offsets[k] + i] & left_masks[k], cells[offsets[j] + k] & right_masks[k-1]
+                    if not left or not right:
+                        continue
+                    probes += left.bit_count() * right.bit_count()
+                    while left:
+                        low = left & -left                              # Bit menys significatiu de la casella esquerra
+                        left ^= low
+                        for c_mask, a_mask in binary_masks[low.bit_length() - 1]:
+                            if right & c_mask:
+                                cell |= a_mask
+                                matches += (right & c_mask).bit_count()
+                table[i, j] = cell
+                stats.add_cell_size(cell.bit_count())
+            stats.probes += probes
+            stats.matches += matches
+            stats.time_per_length[l] = time.perf_counter() - started
+
+
+
+class IncrementalCKY(CKY):
+
+    def __init__(self, grammar, indexes=None):
+        """
+        Inicialitza la classe. Reconeix una paraula caràcter a caràcter, omplint una columna de la taula per caràcter.
+
+        Paràmetres:
+            grammar (list): La gramàtica en forma de llista de tuples on cada tupla és una regla.
+                            Cada regla és de la forma (No terminal, [Body de la regla]).
+            indexes (tuple): Índexs ja compilats per compile_grammar (per exemple, llegits de GrammarCache); si no es donen, es compilen.
+        """
+        super().__init__(grammar, indexes=indexes)
+        self.generating = generating_symbols(self.grammar)  # No terminals que generen alguna paraula
+        self.prefix_parents = defaultdict(set)              # B -> conjunt de A amb una regla A -> B C on C genera alguna paraula
+        for (B, C), heads in self.binary_rules.items():
+            if C in self.generating:
+                self.prefix_parents[B].update(heads)
+        self.reset()
+
+
+    def reset(self):
+        '''
+        Torna a l'estat inicial (paraula buida) per començar a reconèixer una paraula nova.
+        '''
+        start_symbol = self.grammar[0][0]
+        self.word = ''                                                          # Prefix llegit fins ara
+        self.table = Chart(0, set)                                              # Taula CKY del prefix llegit, una columna per caràcter
+        self.prefix_column = []                                                 # prefix_column[i]: no terminals que generen una paraula que comença per word[i:]
+        self.accepted = start_symbol in self.lexicon.get('', ())                # El prefix pertany al llenguatge
+        self.viable = self.accepted or start_symbol in self.generating          # El prefix es pot continuar fins a una paraula del llenguatge
+
+
+    def feed(self, char):
+        '''
+        Afegeix un caràcter al final del prefix llegit i calcula la nova columna de la taula.
+
+        Paràmetres:
+            char (str): El caràcter que s'afegeix.
+
+        Retorna:
+            tuple: (accepted, viable), si el prefix actual pertany al llenguatge i si encara es pot continuar fins a una paraula que hi pertanyi.
+        '''
+        self.word += char
+        if not self.viable:                         # Si cap continuació és possible, no cal omplir més columnes
+            return self.accepted, self.viable
+
+        j = len(self.word)
+        table = self.table
+        table.add_column()
+        self.fill_column(table, self.word, j)
+
+        # Columna de prefixos: A hi és a la posició i si genera una paraula que comença per word[i:j]
+        binary_rules = self.binary_rules
+        prefix_column = [None] * j
+        for i in range(j-1, -1, -1):
+            cell = set(table[i, j])
+            for k in range(i+1, j):
+                left, right = table[i, k], prefix_column[k]
+                if not left or not right:
+                    continue
+                for B in left:
+                    for C in right:
+                        heads = binary_rules.get((B, C))
+                        if heads:
+                            cell.update(heads)
+            pending = list(cell)                    # Clausura: si B hi és i A -> B C amb C generador, A també hi és
+            while pending:
+                for A in self.prefix_parents.get(pending.pop(), ()):
+                    if A not in cell:
+                        cell.add(A)
+                        pending.append(A)
+            prefix_column[i] = cell
+        self.prefix_column = prefix_column
+
+        start_symbol = self.grammar[0][0]
+        self.accepted = start_symbol in table[0, j]
+        self.viable = start_symbol in prefix_column[0]
+        return self.accepted, self.viable
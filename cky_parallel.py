@@ -0,0 +1,185 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from cky import BitsetCKY
+
+
+_worker_state = {}          # Estat de cada procés: màscares de la gramàtica i memòria compartida oberta
+
+
+def cell_offset(i, j, width):
+    '''
+    Calcula la posició en bytes de la casella (i, j) dins la taula compartida.
+    Només es guarden les caselles amb i < j, ordenades per columnes.
+
+    Paràmetres:
+        i (int): Inici de l'interval.
+        j (int): Final de l'interval.
+        width (int): Bytes de cada casella.
+
+    Retorna:
+        int: La posició del primer byte de la casella.
+    '''
+    return (j * (j - 1) // 2 + i) * width
+
+
+def fill_cells(buffer, width, l, first, last, binary_masks, left_mask):
+    '''
+    Omple les caselles (i, i+l) amb first <= i < last llegint i escrivint directament la taula compartida.
+
+    Paràmetres:
+        buffer (memoryview): La taula compartida.
+        width (int): Bytes de cada casella.
+        l (int): Longitud dels intervals de la diagonal.
+        first (int): Primera casella del bloc.
+        last (int): Última casella del bloc (no inclosa).
+        binary_masks (dict): Regles binàries de BitsetCKY.
+        left_mask (int): Màscara dels símbols que poden ser fill esquerre.
+    '''
+    for i in range(first, last):
+        j = i + l
+        cell = 0
+        for k in range(i + 1, j):
+            offset = cell_offset(i, k, width)
+            left = int.from_bytes(buffer[offset:offset + width], 'little') & left_mask
+            if not left:
+                continue
+            offset = cell_offset(k, j, width)
+            right = int.from_bytes(buffer[offset:offset + width], 'little')
+            if not right:
+                continue
+            while left:
+                low = left & -left
+                left ^= low
+                for c_mask, a_mask in binary_masks[low.bit_length() - 1]:
+                    if right & c_mask:
+                        cell |= a_mask
+        offset = cell_offset(i, j, width)
+        buffer[offset:offset + width] = cell.to_bytes(width, 'little')
+
+
+def _init_worker(binary_masks, left_mask):
+    '''
+    Inicialitzador dels processos del pool: rep les màscares de la gramàtica un sol cop per procés.
+    '''
+    _worker_state['binary_masks'] = binary_masks
+    _worker_state['left_mask'] = left_mask
+
+
+def _fill_shared(name, width, l, first, last):
+    '''
+    Omple un bloc d'una diagonal des d'un procés del pool. La memòria compartida s'obre un cop per paraula.
+    '''
+    shm = _worker_state.get('shm')
+    if shm is None or shm.name != name:
+        if shm is not None:
+            shm.close()
+        shm = _worker_state['shm'] = shared_memory.SharedMemory(name=name)
+    fill_cells(shm.buf, width, l, first, last, _worker_state['binary_masks'], _worker_state['left_mask'])
+
+
+class ParallelCKY(BitsetCKY):
+
+    def __init__(self, grammar, workers=None, min_cells=64, min_length=200, indexes=None):
+        """
+        Inicialitza la classe. Les caselles d'una mateixa diagonal (mateixa longitud l) són independents,
+        així que es reparteixen entre processos que llegeixen i escriuen una taula en memòria compartida.
+
+        Paràmetres:
+            grammar (list): La gramàtica en forma de llista de tuples on cada tupla és una regla.
+                            Cada regla és de la forma (No terminal, [Body de la regla]).
+            workers (int): Nombre de processos (per defecte el nombre de CPUs).
+            min_cells (int): Les diagonals amb menys caselles (per procés) s'omplen dins el procés actual (per defecte 64).
+            min_length (int): Les paraules més curtes s'analitzen amb BitsetCKY.parse (per defecte 200).
+            indexes (tuple): Índexs ja compilats per compile_grammar (per exemple, llegits de GrammarCache); si no es donen, es compilen.
+        """
+        super().__init__(grammar, indexes=indexes)
+        self.workers = workers or os.cpu_count() or 1
+        self.min_cells = min_cells
+        self.min_length = min_length
+        self.width = max(1, (len(self.symbols) + 7) // 8)       # Bytes de cada casella
+        self.executor = None                                    # Pool de processos, només es crea si cal
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        '''
+        Atura el pool de processos (si s'ha creat).
+        '''
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+    def parse(self, word, stats=None):
+        '''
+        Comprova si una paraula pertany al llenguatge de la gramàtica omplint cada diagonal en paral·lel.
+        Retorna exactament el mateix resultat que CKY.parse.
+
+        Paràmetres:
+            word (str): La palabra a analitzar.
+            stats (ParseStats): Si es dona, s'hi guarden les mesures de l'anàlisi. Les paraules que s'analitzen en paral·lel
+                                no compten les consultes ni les regles aplicades (es fan als altres processos).
+
+        Retorna:
+            bool: True si la palabra es acceptada per la gramàtica, False en cas contrari.
+        '''
+        n = len(word)
+        if n < self.min_length or self.workers == 1 or not self.word_filter.accepts(word):
+            return super().parse(word, stats)
+        if stats is not None:
+            stats.length = n
+
+        width = self.width
+        shm = shared_memory.SharedMemory(create=True, size=cell_offset(0, n + 1, width))
+        try:
+            buffer = shm.buf
+            # Omple la diagonal de la taula amb els símbols terminals
+            if stats is not None:
+                started = time.perf_counter()
+            for i in range(n):
+                offset = cell_offset(i, i + 1, width)
+                buffer[offset:offset + width] = self.lexicon_masks.get(word[i], 0).to_bytes(width, 'little')
+            if stats is not None:
+                stats.time_per_length[1] = time.perf_counter() - started
+
+            # Omple la resta de la taula diagonal a diagonal
+            for l in range(2, n + 1):
+                if stats is not None:
+                    started = time.perf_counter()
+                cells = n - l + 1
+                if cells < self.min_cells * 2:
+                    fill_cells(buffer, width, l, 0, cells, self.binary_masks, self.left_mask)
+                else:
+                    if self.executor is None:
+                        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                            initargs=(self.binary_masks, self.left_mask))
+                    step = max(self.min_cells, -(-cells // self.workers))
+                    futures = [self.executor.submit(_fill_shared, shm.name, width, l, first, min(first + step, cells))
+                               for first in range(0, cells, step)]
+                    wait(futures)
+                    for future in futures:
+                        future.result()             # Propaga els errors dels processos
+                if stats is not None:
+                    stats.time_per_length[l] = time.perf_counter() - started
+
+            if stats is not None:
+                for offset in range(0, cell_offset(0, n + 1, width), width):
+                    stats.add_cell_size(int.from_bytes(buffer[offset:offset + width], 'little').bit_count())
+
+            offset = cell_offset(0, n, width)
+            root = int.from_bytes(buffer[offset:offset + width], 'little')
+        finally:
+            shm.close()
+            shm.unlink()
+
+        # Comprovar si el símbol inicial es troba a la casella (0, n)
+        return bool(root >> self.bits[self.grammar[0][0]] & 1)
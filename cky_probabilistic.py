@@ -1,70 +1,277 @@
-class ProbabilisticCKY:
-
-    def __init__(self, grammar):
-        """
-        Inicialitza la classe.
-
-        Paràmetres:
-            grammar (list): Una llista de tuples on cada tupla és una regla amb la seva probabilitat.
-                            Cada regla és de la forma ((No terminal, [Body de la regla]), probabilitat).
-        """
-        self.grammar = grammar  # Assigna la gramàtica proporcionada a l'atribut de la classe
-        self.probabilities = self.compute_probabilities()  # Calcula les probabilitats de les regles i les assigna a l'atribut de la classe
-
-
-    def compute_probabilities(self):
-        '''
-        Calcula la probabilitat de cada regla de la gramàtica
-
-        Retorna:
-            dict: Un diccionari amb les regles com a claus i la seva probabilitat com a valors.
-        '''
-        probabilities = {}                              # Crea un diccionari per emmagatzemar les probabilitats
-        for rule, probability in self.grammar:          # Itera per cada regla i probabilitat de la gramàtica
-            rule_tuple = (rule[0], tuple(rule[1]))
-            if rule_tuple not in probabilities:
-                probabilities[rule_tuple] = 0.0
-            probabilities[rule_tuple] += probability    # Afegeix la probabilitat a la regla al diccionari
-        return probabilities                            # Retorna el diccionari de probabilitats
-
-
-    def parse(self, word):
-        '''
-        Comprova si una paraula pertany al llenguatge de la gramàtica.
-
-        Paràmetres:
-            word (str): La palabra a analitzar.
-
-        Retorna:
-            float: la probabilitat de la paraula si pertany a la gramàtica, False en cas que no hi pertanyi.
-        '''
-        n = len(word)
-
-        # Inicialitza la taula CKY amb probabilitats
-        table = [[{} for _ in range(n + 1)] for _ in range(n)] 
-
-        # Omple la diagonal de la taula amb els símbols terminals i les seves probabilitats
-        for i in range(n):
-            for rule, prob in self.grammar:
-                if len(rule[1]) == 1 and rule[1][0] == word[i]:
-                    table[i][i + 1][rule[0]] = prob
-
-        # Omple la resta de la taula
-        for l in range(2, n + 1):
-            for i in range(n - l + 1):
-                j = i + l
-                for k in range(i + 1, j):
-                    for rule, prob in self.probabilities.items():
-                        if len(rule[1]) == 2:
-                            A, BC = rule
-                            B, C = BC
-                            if B in table[i][k] and C in table[k][j]:
-                                probability = prob * table[i][k][B] * table[k][j][C]
-                                if A not in table[i][j]:
-                                    table[i][j][A] = 0.0
-                                table[i][j][A] = max(table[i][j][A], probability)
-
-        # Comprova si el símbol inicial té una probabilitat més gran que 0 a la casella (0, n)
-        start_symbol, _ = self.grammar[0][0]
-        probability = table[0][n].get(start_symbol, 0.0)
-        return probability if probability > 0 else False
\ No newline at end of file
+from collections import defaultdict
+from functools import cached_property
+import math
+from chart import SubstringCache
+from chart_parser import ChartParser
+from grammar_analysis import WordFilter, boundary_children
+from grammar_file import GrammarFile
+
+
+class ProbabilisticCKY(ChartParser):
+
+    cell_type = dict    # Cada casella és un diccionari no terminal -> probabilitat màxima de generar la subparaula
+
+
+    def __init__(self, grammar, cache_bytes=None, indexes=None):
+        """
+        Inicialitza la classe. Aquest analitzador només calcula la probabilitat de les paraules i no guarda punters de
+        la derivació: l'arbre de la millor derivació només es pot obtenir amb ViterbiCKY (parse_log amb keep_tree i tree).
+
+        Paràmetres:
+            grammar (list): Una llista de tuples on cada tupla és una regla amb la seva probabilitat.
+                            Cada regla és de la forma ((No terminal, [Body de la regla]), probabilitat).
+            cache_bytes (int): Si es dona, les caselles es guarden en una cau LRU de subparaules d'aquesta mida màxima
+                               (vegeu chart.SubstringCache) i es reutilitzen entre crides a parse (per defecte no n'hi ha).
+            indexes (tuple): Índexs ja compilats per compile_grammar (per exemple, llegits de GrammarCache); si no es donen, es compilen.
+        """
+        self.grammar = grammar  # Assigna la gramàtica proporcionada a l'atribut de la classe
+        self.cache = SubstringCache(cache_bytes) if cache_bytes else None  # Cau de caselles per subparaula, compartida per totes les paraules
+        self.lexicon, self.binary_rules = indexes if indexes is not None else self.compile_grammar()  # Índexs que fa servir el mètode parse
+        if isinstance(self.grammar, GrammarFile):   # El fitxer ja conté l'anàlisi de la gramàtica
+            self.word_filter = self.grammar.word_filter()
+            self.left_children, self.right_children = self.grammar.boundary_children()
+        else:
+            rules = [rule for rule, _ in self.grammar]
+            self.word_filter = WordFilter(rules, rules[0][0])  # Condicions necessàries que es comproven abans de construir la taula
+            self.left_children, self.right_children = boundary_children(rules)  # Terminal de la frontera -> fills que cal provar
+
+
+    @classmethod
+    def from_file(cls, path):
+        '''
+        Crea l'analitzador a partir d'un fitxer binari de gramàtica probabilística (vegeu grammar_file.write_grammar), obert amb mmap.
+
+        Paràmetres:
+            path (str): Ruta del fitxer.
+
+        Retorna:
+            ProbabilisticCKY: L'analitzador (de la classe des de la qual es crida).
+        '''
+        grammar = GrammarFile(path)
+        if not grammar.probabilistic:
+            raise ValueError(f"{path} no conté probabilitats")
+        return cls(grammar)
+
+
+    @cached_property
+    def probabilities(self):
+        '''
+        Probabilitat total de cada regla (vegeu compute_probabilities). Els índexs de parse no la fan servir, així que
+        només es calcula la primera vegada que es demana.
+        '''
+        return self.compute_probabilities()
+
+
+    def compute_probabilities(self):
+        '''
+        Calcula la probabilitat de cada regla de la gramàtica. Si la gramàtica és un GrammarFile, les probabilitats
+        de les regles repetides ja estan sumades al fitxer (array totals).
+
+        Retorna:
+            dict: Un diccionari amb les regles (No terminal, (Body de la regla)) com a claus i la seva probabilitat com a valors.
+        '''
+        probabilities = {}                              # Crea un diccionari per emmagatzemar les probabilitats
+        if isinstance(self.grammar, GrammarFile):
+            symbols = self.grammar.symbols
+            for head, left, right, total in zip(self.grammar.heads, self.grammar.lefts, self.grammar.rights, self.grammar.totals):
+                if total >= 0:                          # Les repeticions d'una regla tenen total -1
+                    probabilities[symbols[head], (symbols[left],) if right < 0 else (symbols[left], symbols[right])] = total
+            return probabilities
+        for (head, body), probability in self.grammar:  # Itera per cada regla i probabilitat de la gramàtica
+            rule_tuple = (head, tuple(body))
+            if rule_tuple not in probabilities:
+                probabilities[rule_tuple] = 0.0
+            probabilities[rule_tuple] += probability    # Afegeix la probabilitat a la regla al diccionari
+        return probabilities                            # Retorna el diccionari de probabilitats
+
+
+    def compile_grammar(self):
+        '''
+        Compila la gramàtica en dos índexs per evitar recórrer totes les regles a cada casella de la taula, en una
+        sola passada per les regles. Les regles terminals fan servir la probabilitat de la gramàtica (l'última si
+        estan repetides) i les regles binàries la probabilitat acumulada (com a compute_probabilities). Si la gramàtica
+        és un GrammarFile, es llegeixen directament els arrays del fitxer, que ja tenen les probabilitats acumulades.
+
+        Retorna:
+            tuple: Un diccionari terminal -> {head: probabilitat} i un diccionari (B, C) -> llista de (A, probabilitat).
+        '''
+        lexicon = defaultdict(dict)
+        if isinstance(self.grammar, GrammarFile):
+            grammar = self.grammar
+            symbols = grammar.symbols
+            binary_rules = defaultdict(list)
+            for head, left, right, prob, total in zip(grammar.heads, grammar.lefts, grammar.rights, grammar.probabilities, grammar.totals):
+                if right < 0:
+                    lexicon[symbols[left]][symbols[head]] = prob
+                elif total >= 0:                        # Les repeticions d'una regla tenen total -1 (ja sumades a la primera aparició)
+                    binary_rules[(symbols[left], symbols[right])].append((symbols[head], total))
+            return dict(lexicon), dict(binary_rules)
+
+        totals = defaultdict(dict)                      # (B, C) -> {A: probabilitat acumulada}, en ordre de primera aparició
+        for (head, body), prob in self.grammar:
+            if len(body) == 1:
+                lexicon[body[0]][head] = prob
+            elif len(body) == 2:
+                heads = totals[(body[0], body[1])]
+                heads[head] = heads.get(head, 0.0) + prob
+        return dict(lexicon), {pair: list(heads.items()) for pair, heads in totals.items()}
+
+
+    def epsilon_probability(self):
+        '''
+        Retorna la probabilitat de la paraula buida (regla del símbol inicial que genera epsilon).
+
+        Retorna:
+            float: La probabilitat de la regla, o False si el símbol inicial no genera epsilon.
+        '''
+        start_symbol, _ = self.grammar[0][0]
+        probability = self.lexicon.get('', {}).get(start_symbol, 0.0)
+        return probability if probability > 0 else False
+
+
+    def empty_word_result(self):
+        '''
+        Retorna el resultat de parse per a la paraula buida quan passa el filtre.
+
+        Retorna:
+            float: La probabilitat de la paraula buida (vegeu epsilon_probability).
+        '''
+        return self.epsilon_probability()
+
+
+    def result(self, cell):
+        '''
+        Comprova si el símbol inicial té una probabilitat més gran que 0 a la casella (0, n).
+
+        Paràmetres:
+            cell (dict): La casella (0, n) de la taula.
+
+        Retorna:
+            float: la probabilitat de la paraula si pertany a la gramàtica, False en cas que no hi pertanyi.
+        '''
+        start_symbol, _ = self.grammar[0][0]
+        probability = cell.get(start_symbol, 0.0)
+        return probability if probability > 0 else False
+
+
+    def parse_log(self, word, stats=None):
+        '''
+        Calcula el logaritme de la probabilitat de la paraula. La probabilitat es calcula com a parse, en float, així
+        que per paraules molt llargues pot arrodonir-se a 0 (ViterbiCKY.parse_log treballa directament en espai logarítmic).
+
+        Paràmetres:
+            word (str): La palabra a analitzar.
+            stats (ParseStats): Si es dona, s'hi guarden les mesures de l'anàlisi.
+
+        Retorna:
+            float: La log-probabilitat de la paraula, o -inf si no pertany a la gramàtica.
+        '''
+        probability = self.parse(word, stats)
+        return math.log(probability) if probability else -math.inf
+
+
+    def fill_cell(self, table, word, i, j):
+        '''
+        Calcula la casella (i, j) a partir de les caselles (i, k) i (k, j), que ja han d'estar calculades.
+        Per a cada no terminal A de les regles A -> B C es queda amb la probabilitat màxima. Com a CKY.fill_cell,
+        només es proven els B i els C que poden formar alguna regla amb els terminals word[k-1] i word[k] de la frontera.
+
+        Paràmetres:
+            table (Chart): La taula CKY.
+            word (str): La paraula a analitzar.
+            i (int): Inici de l'interval.
+            j (int): Final de l'interval.
+
+        Retorna:
+            dict: Un diccionari no terminal -> probabilitat màxima de generar word[i:j] (o la casella buida de la taula).
+        '''
+        binary_rules = self.binary_rules
+        left_children, right_children = self.left_children, self.right_children
+        cells, offsets = table.cells, table.offsets
+        cell = {}
+        column = offsets[j]
+        for k in range(i + 1, j):
+            left = cells[offsets[k] + i]
+            if not left:
+                continue
+            right = cells[column + k]
+            if not right:
+                continue
+            left = left.items()
+            allowed = left_children.get(word[k])
+            if allowed is not None:
+                left = [(B, left_prob) for B, left_prob in left if B in allowed]
+                if not left:
+                    continue
+            right = right.items()
+            allowed = right_children.get(word[k - 1])
+            if allowed is not None:
+                right = [(C, right_prob) for C, right_prob in right if C in allowed]
+                if not right:
+                    continue
+            for B, left_prob in left:
+                for C, right_prob in right:
+                    rules = binary_rules.get((B, C))
+                    if rules:
+                        for A, prob in rules:
+                            probability = prob * left_prob * right_prob
+                            if A not in cell:
+                                cell[A] = 0.0
+                            cell[A] = max(cell[A], probability)
+        return cell or table.empty
+
+
+    def fill_cell_counted(self, table, word, i, j, stats):
+        '''
+        Com fill_cell, però a més compta les consultes a l'índex de regles i les regles aplicades i actualitza stats.
+
+        Paràmetres:
+            table (Chart): La taula CKY.
+            word (str): La paraula a analitzar.
+            i (int): Inici de l'interval.
+            j (int): Final de l'interval.
+            stats (ParseStats): On es guarden les mesures.
+
+        Retorna:
+            dict: Un diccionari no terminal -> probabilitat màxima de generar word[i:j] (o la casella buida de la taula).
+        '''
+        binary_rules = self.binary_rules
+        left_children, right_children = self.left_children, self.right_children
+        cells, offsets = table.cells, table.offsets
+        cell = {}
+        column = offsets[j]
+        probes = matches = 0
+        for k in range(i + 1, j):
+            left = cells[offsets[k] + i]
+            if not left:
+                continue
+            right = cells[column + k]
+            if not right:
+                continue
+            left = left.items()
+            allowed = left_children.get(word[k])
+            if allowed is not None:
+                left = [(B, left_prob) for B, left_prob in left if B in allowed]
+                if not left:
+                    continue
+            right = right.items()
+            allowed = right_children.get(word[k - 1])
+            if allowed is not None:
+                right = [(C, right_prob) for C, right_prob in right if C in allowed]
+                if not right:
+                    continue
+            probes += len(left) * len(right)
+            for B, left_prob in left:
+                for C, right_prob in right:
+                    rules = binary_rules.get((B, C))
+                    if rules:
+                        matches += len(rules)
+                        for A, prob in rules:
+                            probability = prob * left_prob * right_prob
+                            if A not in cell:
+                                cell[A] = 0.0
+                            cell[A] = max(cell[A], probability)
+        stats.probes += probes
+        stats.matches += matches
+        stats.add_cell(cell)
+        return cell or table.empty
@@ -0,0 +1,171 @@
+import numpy as np
+from cky import CKY
+
+
+class ValiantCKY(CKY):
+
+    def __init__(self, grammar, leaf_size=16, max_block=1 << 24, indexes=None):
+        """
+        Inicialitza la classe. Reconeixedor que redueix CKY a productes de matrius booleanes, com l'algorisme de Valiant
+        (en la formulació d'Okhotin): la taula és una matriu booleana (n+1)x(n+1) per a cada no terminal i la taula es
+        divideix recursivament en blocs. Les contribucions dels punts de tall d'un bloc ja calculat es sumen amb un producte
+        de matrius (BLAS) per regla, en lloc del bucle sobre k de CKY. Els blocs petits s'omplen diagonal a diagonal.
+
+        Paràmetres:
+            grammar (list): La gramàtica en forma de llista de tuples on cada tupla és una regla.
+                            Cada regla és de la forma (No terminal, [Body de la regla]).
+            leaf_size (int): Mida màxima dels blocs que s'omplen directament en lloc de dividir-se (per defecte 16).
+            max_block (int): Nombre màxim d'elements dels arrays temporals de cada grup de productes (per defecte 2^24).
+            indexes (tuple): Índexs ja compilats per compile_grammar (per exemple, llegits de GrammarCache); si no es donen, es compilen.
+        """
+        super().__init__(grammar, indexes=indexes)
+        self.leaf_size = leaf_size
+        self.max_block = max_block
+        self.symbols, self.index = self.intern_symbols()       # Llista de no terminals i diccionari no terminal -> índex
+        self.lexicon_heads = {terminal: np.array(sorted(self.index[head] for head in heads), dtype=np.intp)
+                              for terminal, heads in self.lexicon.items()}
+        self.compile_binary_rules()                             # Arrays d'índexs de les regles binàries
+        self.T = self.P = None                                  # Taules de la paraula que s'està analitzant (vegeu parse)
+
+
+    def intern_symbols(self):
+        '''
+        Assigna un índex a cada no terminal de la gramàtica (en ordre d'aparició).
+
+        Retorna:
+            tuple: La llista de no terminals i un diccionari no terminal -> índex.
+        '''
+        index = {}
+        for head, body in self.grammar:
+            for symbol in [head] + (list(body) if len(body) == 2 else []):
+                if symbol not in index:
+                    index[symbol] = len(index)
+        return list(index), index
+
+
+    def compile_binary_rules(self):
+        '''
+        Converteix les regles binàries A -> B C en arrays d'índexs ordenats per A, de manera que el resultat
+        per a cada no terminal es pot calcular amb np.logical_or.reduceat.
+        '''
+        rules = sorted((self.index[A], self.index[B], self.index[C]) for (B, C), heads in self.binary_rules.items() for A in heads)
+        self.rule_heads = np.array([rule[0] for rule in rules], dtype=np.intp)
+        self.rule_left = np.array([rule[1] for rule in rules], dtype=np.intp)
+        self.rule_right = np.array([rule[2] for rule in rules], dtype=np.intp)
+        self.head_starts = np.flatnonzero(np.r_[True, self.rule_heads[1:] != self.rule_heads[:-1]]) if rules else np.array([], dtype=np.intp)
+        self.heads = self.rule_heads[self.head_starts]
+
+
+    def parse(self, word, stats=None):
+        '''
+        Comprova si una paraula pertany al llenguatge de la gramàtica. Retorna exactament el mateix resultat que CKY.parse.
+
+        Paràmetres:
+            word (str): La palabra a analitzar.
+            stats (ParseStats): Si es dona, s'hi guarden la longitud, si la paraula s'ha filtrat i les caselles de la taula.
+                                La taula s'omple per blocs i amb productes de matrius, així que no hi ha temps per longitud
+                                ni consultes a l'índex de regles.
+
+        Retorna:
+            bool: True si la palabra es acceptada per la gramàtica, False en cas contrari.
+        '''
+        if stats is not None:
+            stats.length = len(word)
+        if not self.word_filter.accepts(word):      # Descarta en temps lineal les paraules que no poden pertànyer al llenguatge
+            if stats is not None:
+                stats.filtered = True
+            return False
+        if not word:                                # La paraula buida només passa el filtre si el símbol inicial genera epsilon
+            return True
+
+        n = len(word)
+        size = 2
+        while size < n + 1:                         # La recursió divideix les posicions 0..n en meitats iguals
+            size *= 2
+        # T[A, i, j] indica si A genera word[i:j]; P[A, i, j] acumula les contribucions dels punts de tall ja processats
+        self.T = np.zeros((len(self.symbols), size, size), dtype=bool)
+        self.P = np.zeros_like(self.T)
+        for i in range(n):
+            heads = self.lexicon_heads.get(word[i])
+            if heads is not None:
+                self.T[heads, i, i + 1] = True
+
+        if len(self.rule_heads):
+            self.compute(0, size)
+        accepted = bool(self.T[self.index[self.grammar[0][0]], 0, n])
+        if stats is not None:
+            sizes = self.T.sum(axis=0)              # Nombre de no terminals de cada casella (i, j)
+            stats.non_empty_cells += int(np.count_nonzero(sizes))
+            stats.peak_cell_size = max(stats.peak_cell_size, int(sizes.max()))
+        self.T = self.P = None
+        return accepted
+
+
+    def compute(self, l, m):
+        '''
+        Calcula totes les caselles (i, j) amb l <= i < j < m.
+        '''
+        if m - l <= self.leaf_size:
+            self.fill(l, m, l, m)
+            return
+        middle = (l + m) // 2
+        self.compute(l, middle)
+        self.compute(middle, m)
+        self.complete(l, middle, middle, m)
+
+
+    def complete(self, l, m, l2, m2):
+        '''
+        Calcula les caselles (i, j) amb l <= i < m i l2 <= j < m2, suposant que les caselles dins de [l, m) i de [l2, m2)
+        ja estan calculades i que P ja conté les contribucions de tots els punts de tall k amb m <= k < l2.
+        '''
+        if m - l <= self.leaf_size:
+            self.fill(l, m, l2, m2)
+            return
+        middle, middle2 = (l + m) // 2, (l2 + m2) // 2
+        self.complete(middle, m, l2, middle2)                       # Bloc més proper a la diagonal
+        self.multiply(slice(l, middle), slice(middle, m), slice(l2, middle2))
+        self.complete(l, middle, l2, middle2)
+        self.multiply(slice(middle, m), slice(l2, middle2), slice(middle2, m2))
+        self.complete(middle, m, middle2, m2)
+        self.multiply(slice(l, middle), slice(middle, m), slice(middle2, m2))
+        self.multiply(slice(l, middle), slice(l2, middle2), slice(middle2, m2))
+        self.complete(l, middle, middle2, m2)                       # Bloc més llunyà de la diagonal
+
+
+    def multiply(self, rows, splits, columns):
+        '''
+        Afegeix a P[A, rows, columns] el producte booleà T[B, rows, splits] x T[C, splits, columns] per a cada regla A -> B C.
+        Només es multipliquen les regles amb els dos blocs no buits, en grups de com a màxim max_block elements.
+        '''
+        left, right = self.T[:, rows, splits], self.T[:, splits, columns]
+        active = np.flatnonzero(left.any(axis=(1, 2))[self.rule_left] & right.any(axis=(1, 2))[self.rule_right])
+        if not len(active):
+            return
+        left, right = left.astype(np.float32), right.astype(np.float32)     # Les sumes de 0 i 1 són exactes i BLAS només multiplica floats
+        r, k, c = left.shape[1], left.shape[2], right.shape[2]
+        step = max(1, self.max_block // (r * k + k * c + r * c))
+        for first in range(0, len(active), step):
+            chunk = active[first:first + step]
+            products = np.matmul(left[self.rule_left[chunk]], right[self.rule_right[chunk]]) > 0
+            heads = self.rule_heads[chunk]
+            starts = np.flatnonzero(np.r_[True, heads[1:] != heads[:-1]])
+            self.P[heads[starts], rows, columns] |= np.logical_or.reduceat(products, starts, axis=0)
+
+
+    def fill(self, l, m, l2, m2):
+        '''
+        Omple directament les caselles (i, j) amb l <= i < m, l2 <= j < m2 i i < j, diagonal a diagonal, amb els punts de tall
+        que encara no són a P (k a [l+1, m) o a [l2, m2); la resta de valors de k donen caselles buides).
+        '''
+        T = self.T
+        splits = np.unique(np.r_[np.arange(l + 1, m), np.arange(l2, m2)])
+        left_rules, right_rules = self.rule_left[:, None, None], self.rule_right[:, None, None]
+        for d in range(max(2, l2 - m + 1), m2 - l):                 # Longitud j - i (les caselles de longitud 1 ja són a la taula)
+            I = np.arange(max(l, l2 - d), min(m, m2 - d))
+            if not len(I):
+                continue
+            J = I + d
+            hits = (T[left_rules, I[None, :, None], splits[None, None, :]] & T[right_rules, splits[None, None, :], J[None, :, None]]).any(axis=2)
+            cells = (self.heads[:, None], I[None, :], J[None, :])
+            T[cells] |= np.logical_or.reduceat(hits, self.head_starts, axis=0) | self.P[cells]
@@ -0,0 +1,225 @@
+import math
+import time
+import numpy as np
+from cky_probabilistic import ProbabilisticCKY
+
+
+class ViterbiCKY(ProbabilisticCKY):
+
+    def __init__(self, grammar, max_block=1 << 22, indexes=None):
+        """
+        Inicialitza la classe. La taula és un array (n, n+1, |N|) de log-probabilitats i cada diagonal
+        es calcula amb operacions vectoritzades de NumPy sobre arrays d'índexs de regles.
+
+        Paràmetres:
+            grammar (list): Una llista de tuples on cada tupla és una regla amb la seva probabilitat.
+                            Cada regla és de la forma ((No terminal, [Body de la regla]), probabilitat).
+            max_block (int): Nombre màxim d'elements dels arrays temporals que es creen per omplir una diagonal (per defecte 2^22).
+            indexes (tuple): Índexs ja compilats per compile_grammar (per exemple, llegits de GrammarCache); si no es donen, es compilen.
+        """
+        super().__init__(grammar, indexes=indexes)
+        self.max_block = max_block
+        self.symbols, self.index = self.intern_symbols()       # Llista de no terminals i diccionari no terminal -> índex
+        self.lexicon_scores = self.compile_lexicon()            # terminal -> array de log-probabilitats per a cada no terminal
+        self.compile_binary_rules()                             # Arrays d'índexs de les regles binàries
+        self.symbol_dtype = np.int16 if len(self.symbols) < 2 ** 15 else np.int32
+        self.backpointers = None                                # Punters de l'última paraula analitzada amb keep_tree (es fan servir a tree)
+
+
+    def intern_symbols(self):
+        '''
+        Assigna un índex a cada no terminal de la gramàtica (en ordre d'aparició).
+
+        Retorna:
+            tuple: La llista de no terminals i un diccionari no terminal -> índex.
+        '''
+        index = {}
+        for (head, body), _ in self.grammar:
+            for symbol in [head] + (list(body) if len(body) == 2 else []):
+                if symbol not in index:
+                    index[symbol] = len(index)
+        return list(index), index
+
+
+    def compile_lexicon(self):
+        '''
+        Calcula, per a cada terminal, el vector de log-probabilitats de les regles A -> terminal.
+        Com a ProbabilisticCKY.parse, si una regla terminal està repetida es fa servir l'última probabilitat.
+
+        Retorna:
+            dict: Un diccionari terminal -> array de mida |N| (amb -inf pels no terminals que no el generen).
+        '''
+        lexicon = {}
+        with np.errstate(divide='ignore'):
+            for (head, body), prob in self.grammar:
+                if len(body) == 1:
+                    if body[0] not in lexicon:
+                        lexicon[body[0]] = np.full(len(self.symbols), -np.inf)
+                    lexicon[body[0]][self.index[head]] = np.log(prob)
+        return lexicon
+
+
+    def compile_binary_rules(self):
+        '''
+        Converteix les regles binàries A -> B C en arrays d'índexs ordenats per A, de manera que el màxim
+        per a cada no terminal es pot calcular amb np.maximum.reduceat.
+        '''
+        index = self.index
+        rules = sorted((index[A], index[B], index[C], prob) for (B, C), heads in self.binary_rules.items() for A, prob in heads)
+        with np.errstate(divide='ignore'):
+            self.rule_heads = np.array([r[0] for r in rules], dtype=np.intp)
+            self.rule_left = np.array([r[1] for r in rules], dtype=np.intp)
+            self.rule_right = np.array([r[2] for r in rules], dtype=np.intp)
+            self.rule_scores = np.log(np.array([r[3] for r in rules], dtype=float))
+        # Inici de cada grup de regles amb el mateix head i el head corresponent
+        starts = np.flatnonzero(np.r_[True, self.rule_heads[1:] != self.rule_heads[:-1]]) if rules else np.array([], dtype=np.intp)
+        self.head_starts = starts
+        self.heads = self.rule_heads[starts]
+
+
+    def parse_log(self, word, stats=None, keep_tree=False):
+        '''
+        Calcula la log-probabilitat de la millor derivació de la paraula. Com que es treballa en espai logarítmic,
+        el resultat no s'arrodoneix a 0 per paraules llargues. Amb keep_tree també guarda, per a cada casella i no terminal,
+        el punt de tall i els dos no terminals de la millor regla en arrays compactes, que fa servir el mètode tree; sense
+        keep_tree no es creen aquests arrays (tres arrays (n, n+1, |N|)) ni es calcula quina regla guanya.
+
+        Paràmetres:
+            word (str): La palabra a analitzar.
+            stats (ParseStats): Si es dona, s'hi guarden la longitud, si la paraula s'ha filtrat, les caselles de la taula
+                                i el temps de cada diagonal. Les regles s'avaluen totes alhora amb arrays, així que no es
+                                compten consultes a l'índex de regles.
+            keep_tree (bool): Si és True, es guarden els punters de la millor derivació per poder cridar tree (per defecte False).
+
+        Retorna:
+            float: La log-probabilitat de la paraula, o -inf si no pertany a la gramàtica.
+        '''
+        self.backpointers = (word, -math.inf, None, None, None) if keep_tree else None
+        if stats is not None:
+            stats.length = len(word)
+        if not self.word_filter.accepts(word):      # Descarta en temps lineal les paraules que no poden pertànyer al llenguatge
+            if stats is not None:
+                stats.filtered = True
+            return -math.inf
+        if not word:                                # La paraula buida només passa el filtre si el símbol inicial genera epsilon
+            probability = self.epsilon_probability()
+            return math.log(probability) if probability else -math.inf
+
+        n = len(word)
+        N = len(self.symbols)
+        chart = np.full((n, n + 1, N), -np.inf)
+        if keep_tree:
+            split_dtype = np.int16 if n < 2 ** 15 else np.int32
+            back_split = np.zeros((n, n + 1, N), dtype=split_dtype)             # Punt de tall k de la millor regla
+            back_left = np.zeros((n, n + 1, N), dtype=self.symbol_dtype)       # No terminal B de la millor regla A -> B C
+            back_right = np.zeros((n, n + 1, N), dtype=self.symbol_dtype)      # No terminal C de la millor regla A -> B C
+
+        # Omple la diagonal de la taula amb els símbols terminals i les seves log-probabilitats
+        if stats is not None:
+            started = time.perf_counter()
+        for i in range(n):
+            scores = self.lexicon_scores.get(word[i])
+            if scores is not None:
+                chart[i, i + 1] = scores
+        if stats is not None:
+            stats.time_per_length[1] = time.perf_counter() - started
+
+        # Omple la resta de la taula diagonal a diagonal (totes les caselles amb la mateixa longitud l)
+        R = len(self.rule_heads)
+        if R:
+            group_sizes = np.diff(np.r_[self.head_starts, R])
+            rule_positions = R - np.arange(R)                                               # Permet trobar la primera regla màxima de cada grup amb reduceat
+            for l in range(2, n + 1):
+                if stats is not None:
+                    started = time.perf_counter()
+                splits = np.arange(1, l)                                                    # Desplaçaments k - i dels punts de tall
+                step = max(1, self.max_block // ((l - 1) * R))                             # Caselles que es calculen alhora
+                for first in range(0, n - l + 1, step):
+                    I = np.arange(first, min(first + step, n - l + 1))
+                    J = I + l
+                    K = I[:, None] + splits[None, :]
+                    left = chart[I[:, None], K]                                             # (caselles, l-1, |N|): caselles (i, k)
+                    right = chart[K, J[:, None]]                                            # (caselles, l-1, |N|): caselles (k, j)
+                    candidates = left[:, :, self.rule_left] + right[:, :, self.rule_right]
+                    cells = (I[:, None], J[:, None], self.heads[None, :])
+                    if not keep_tree:
+                        scores = candidates.max(axis=1) + self.rule_scores                  # (caselles, R): millor puntuació per regla
+                        chart[cells] = np.maximum.reduceat(scores, self.head_starts, axis=1)
+                        continue
+                    best_split = candidates.argmax(axis=1)                                  # (caselles, R): millor punt de tall per regla
+                    scores = np.take_along_axis(candidates, best_split[:, None, :], axis=1)[:, 0, :] + self.rule_scores
+                    best = np.maximum.reduceat(scores, self.head_starts, axis=1)           # (caselles, heads): millor puntuació per head
+                    winners = scores == np.repeat(best, group_sizes, axis=1)
+                    best_rule = R - np.maximum.reduceat(np.where(winners, rule_positions, 0), self.head_starts, axis=1)
+                    chart[cells] = best
+                    back_split[cells] = I[:, None] + 1 + np.take_along_axis(best_split, best_rule, axis=1)
+                    back_left[cells] = self.rule_left[best_rule]
+                    back_right[cells] = self.rule_right[best_rule]
+                if stats is not None:
+                    stats.time_per_length[l] = time.perf_counter() - started
+
+        start_symbol, _ = self.grammar[0][0]
+        log_probability = float(chart[0, n, self.index[start_symbol]])
+        if stats is not None:
+            sizes = np.isfinite(chart).sum(axis=2)  # Nombre de no terminals de cada casella (i, j)
+            stats.non_empty_cells += int(np.count_nonzero(sizes))
+            stats.peak_cell_size = max(stats.peak_cell_size, int(sizes.max()))
+        if keep_tree:
+            self.backpointers = (word, log_probability, back_split, back_left, back_right)
+        return log_probability
+
+
+    def tree(self):
+        '''
+        Reconstrueix l'arbre de la millor derivació de l'última paraula analitzada, seguint només els punters del camí guanyador.
+        La paraula s'ha d'haver analitzat amb parse_log(word, keep_tree=True).
+
+        Retorna:
+            tuple: L'arbre en forma de tuples (No terminal, fill esquerre, fill dret) o (No terminal, terminal) a les fulles,
+                   o None si l'última paraula no pertany a la gramàtica o és la paraula buida.
+        '''
+        if self.backpointers is None:
+            raise ValueError("No hi ha punters guardats: cal analitzar la paraula amb parse_log(word, keep_tree=True)")
+        word, log_probability, back_split, back_left, back_right = self.backpointers
+        if log_probability == -np.inf or back_split is None:
+            return None
+
+        start_symbol, _ = self.grammar[0][0]
+        root = (0, len(word), self.index[start_symbol])
+        built = {}                              # (i, j, A) -> subarbre ja construït
+        stack = [root]                          # Recorregut en postordre sense recursivitat (els arbres poden ser molt profunds)
+        while stack:
+            i, j, A = stack[-1]
+            if j == i + 1:
+                built[(i, j, A)] = (self.symbols[A], word[i])
+                stack.pop()
+                continue
+            k = int(back_split[i, j, A])
+            left, right = (i, k, int(back_left[i, j, A])), (k, j, int(back_right[i, j, A]))
+            missing = [node for node in (right, left) if node not in built]
+            if missing:
+                stack.extend(missing)
+            else:
+                built[(i, j, A)] = (self.symbols[A], built[left], built[right])
+                stack.pop()
+        return built[root]
+
+
+    def parse(self, word, stats=None):
+        '''
+        Comprova si una paraula pertany al llenguatge de la gramàtica.
+
+        Paràmetres:
+            word (str): La palabra a analitzar.
+            stats (ParseStats): Si es dona, s'hi guarden les mesures de l'anàlisi (vegeu parse_log).
+
+        Retorna:
+            float: la probabilitat de la paraula si pertany a la gramàtica, False en cas que no hi pertanyi.
+                   Per paraules molt llargues la probabilitat pot ser massa petita per representar-se: llavors es retorna
+                   el float positiu més petit (perquè el resultat d'una paraula acceptada sigui sempre cert) i el valor
+                   exacte s'ha d'obtenir amb parse_log (és el que fan servir els registres de batch i del servei).
+        '''
+        log_probability = self.parse_log(word, stats)
+        if log_probability == -math.inf:
+            return False
+        return math.exp(log_probability) or math.ulp(0.0)
@@ -1,3 +1,7 @@
+from collections import defaultdict
+from grammar_analysis import is_terminal, useful_rules
+
+
 class CNFConverter:
 
     def __init__(self, cfg_grammar, prob=False):
@@ -12,6 +16,7 @@ class CNFConverter:
         self.cnf_grammar = self.cfg_grammar.copy()      # Crea una còpia de la gramàtica CFG per modificar-la i convertir-la a CNF.
         self.prob = prob                                # Crea un atribut que indica si la gramàtica és probabilística o no
         self.epsilon = False                            # Crea un atribut que indica si el símbol inicial pot generar epsilon (inicialitzat a False)
+        self.removed_rules = 0                          # Crea un atribut amb el nombre de regles inútils eliminades durant la conversió
         if not self.prob:                               # Comprova si pot generar epsilon, i en cas que pugui, canvia a True
             if self.cnf_grammar[0][1][0] == '':
                 self.epsilon = True
@@ -281,6 +286,25 @@ class CNFConverter:
         return self.cnf_grammar                                 # Retorna la gramàtica modificada
 
 
+    def remove_useless_symbols(self):
+        '''
+        Elimina les regles amb símbols inútils: no terminals que no generen cap paraula de terminals o que no es
+        poden assolir des de 'ST'. El llenguatge de la gramàtica no canvia. Si 'ST' no genera cap paraula, la gramàtica
+        no es modifica (el llenguatge és buit i s'ha de conservar alguna regla amb el símbol inicial).
+
+        Retorna:
+            tuple: La gramàtica sense símbols inútils i el nombre de regles eliminades.
+        '''
+        rules = [rule[0] if self.prob else rule for rule in self.cnf_grammar]      # Regles sense probabilitats
+        kept = useful_rules(rules, 'ST')
+        if not kept:
+            return self.cnf_grammar, 0
+
+        removed = len(self.cnf_grammar) - len(kept)
+        self.cnf_grammar = [self.cnf_grammar[idx] for idx in kept]                  # Conserva l'ordre (la regla de 'ST' continua sent la primera)
+        return self.cnf_grammar, removed
+
+
     def converter(self):
         '''
         Converteix una gramàtica CFG a CNF, cridant als mètodes necessaris per ordre.
@@ -298,6 +322,7 @@ class CNFConverter:
         self.remove_unit_productions()          # Elimina les regles unitàrias de la gramàtica
         self.introduce_aux_symbols()            # Introdueix símbols auxiliars per a reemplaçar els símbols terminals en les regles mixtes
         self.replace_long_productions()         # Reemplaça les produccions llargues per produccions de longitud
+        _, self.removed_rules = self.remove_useless_symbols()       # Elimina les regles amb símbols que no generen cap paraula o inassolibles
 
         if self.epsilon:                        # S'afegeix la regla eliminada anteriorment (en cas que s'hagi eliminat)
             self.cnf_grammar = [first_rule] + self.cnf_grammar
@@ -308,3 +333,162 @@ class CNFConverter:
 
         return self.cnf_grammar                 # Retorna la gramática en la seva forma normal de Chomsky (CNF)
 
+
+
+class FastCNFConverter(CNFConverter):
+
+    def __init__(self, cfg_grammar, prob=False):
+        """
+        Inicialitza la classe. Converteix la gramàtica a CNF en temps gairebé lineal fent servir diccionaris indexats pel head,
+        els conjunts de símbols anul·lables i de clausura unitària i llistes de treball, en lloc de reconstruir la gramàtica a
+        cada pas. Genera una gramàtica equivalent a la de CNFConverter.converter (els noms dels símbols nous poden canviar).
+
+        Paràmetres:
+            cfg_grammar (list): Llista de regles (No terminal, [Body de la regla]) de la gramàtica lliure de context (CFG).
+            prob (bool): Indica si la gramàtica és probabilística; només es poden convertir gramàtiques sense probabilitats.
+        """
+        if prob:
+            raise ValueError("FastCNFConverter només converteix gramàtiques sense probabilitats")
+        super().__init__(cfg_grammar, prob)
+        self.symbols = {head for head, _ in cfg_grammar} | {s for _, body in cfg_grammar for s in body if not is_terminal(s)}
+        self.counters = {}              # Base del nom -> següent número a provar per crear símbols nous
+
+
+    def new_symbol(self, base):
+        '''
+        Crea un no terminal nou que no existeix a la gramàtica, de la forma base, base1, base2...
+
+        Paràmetres:
+            base (str): El nom base del símbol.
+
+        Retorna:
+            str: El nom del no terminal nou.
+        '''
+        counter = self.counters.get(base, 0)
+        name = base if counter == 0 else base + str(counter)
+        while name in self.symbols:
+            counter += 1
+            name = base + str(counter)
+        self.counters[base] = counter + 1
+        self.symbols.add(name)
+        return name
+
+
+    def converter(self):
+        '''
+        Converteix la gramàtica CFG a CNF: símbol inicial, terminals en regles llargues, regles binàries,
+        eliminació de produccions epsilon, eliminació de produccions unitàries i eliminació de símbols inútils.
+
+        Retorna:
+            list: La gramàtica en CNF, amb les regles de 'ST' al principi.
+        '''
+        rules = [(head, [symbol for symbol in body if symbol != '']) for head, body in self.cfg_grammar]   # Body buit = epsilon
+
+        # Símbol inicial 'ST' que no apareix en cap body
+        start = rules[0][0]
+        in_body = any(start in body for _, body in rules)
+        if 'ST' in self.symbols and (start != 'ST' or in_body):        # Si 'ST' ja existeix i no es pot reutilitzar, se li canvia el nom
+            renamed = self.new_symbol('ST')
+            rules = [(renamed if head == 'ST' else head, [renamed if s == 'ST' else s for s in body]) for head, body in rules]
+            start = renamed if start == 'ST' else start
+        self.symbols.add('ST')
+        if in_body:
+            rules = [('ST', [start])] + rules
+        else:
+            rules = [('ST' if head == start else head, body) for head, body in rules]
+
+        # Terminals en regles de longitud >= 2 i regles de més de dos símbols
+        terminal_symbols = {}           # terminal -> no terminal que el genera
+        tails = {}                      # tuple de símbols -> no terminal que genera aquesta seqüència (es comparteixen entre regles)
+        binary = []
+        for head, body in rules:
+            if len(body) >= 2:
+                for idx, symbol in enumerate(body):
+                    if is_terminal(symbol):
+                        if symbol not in terminal_symbols:
+                            base = symbol.upper()
+                            if is_terminal(base):      # Lletres sense majúscula (p. ex. 'º'): el nom no pot semblar un terminal
+                                base = 'T'
+                            terminal_symbols[symbol] = self.new_symbol(base)
+                            binary.append((terminal_symbols[symbol], [symbol]))
+                        body[idx] = terminal_symbols[symbol]
+            while len(body) > 2:        # A -> X1 X2 ... Xk  =>  A -> X1 Y, Y -> X2 ... Xk
+                tail = tuple(body[1:])
+                if tail in tails:       # La resta del body ja té un símbol: no cal crear-ne cap més
+                    body = [body[0], tails[tail]]
+                    break
+                tails[tail] = self.new_symbol('X')
+                binary.append((head, [body[0], tails[tail]]))
+                head, body = tails[tail], list(tail)
+            binary.append((head, body))
+
+        # Símbols anul·lables (generen epsilon), amb un comptador de símbols pendents per regla
+        nullable = set()
+        pending = []
+        users = defaultdict(list)
+        queue = []
+        for idx, (head, body) in enumerate(binary):
+            if any(is_terminal(symbol) for symbol in body):      # Les regles amb terminals no poden generar epsilon
+                pending.append(-1)
+                continue
+            pending.append(len(body))
+            for symbol in body:
+                users[symbol].append(idx)
+            if not body and head not in nullable:
+                nullable.add(head)
+                queue.append(head)
+        while queue:
+            for idx in users[queue.pop()]:
+                pending[idx] -= 1
+                head = binary[idx][0]
+                if pending[idx] == 0 and head not in nullable:
+                    nullable.add(head)
+                    queue.append(head)
+
+        # Elimina les produccions epsilon: A -> B C amb C anul·lable dona A -> B (i igual amb B)
+        by_head = defaultdict(list)     # head -> llista de bodies sense repetir
+        seen = set()
+        for head, body in binary:
+            options = [body]
+            if len(body) == 2:
+                if body[1] in nullable:
+                    options.append([body[0]])
+                if body[0] in nullable:
+                    options.append([body[1]])
+            for option in options:
+                key = (head, tuple(option))
+                if option and not (len(option) == 1 and option[0] == head) and key not in seen:
+                    seen.add(key)
+                    by_head[head].append(option)
+
+        # Elimina les produccions unitàries: cada A rep les regles no unitàries de tots els B amb A =>* B
+        cnf = []
+        seen = set()
+        for head in list(by_head):
+            closure = {head}
+            queue = [head]
+            while queue:
+                for body in by_head.get(queue.pop(), ()):
+                    if len(body) == 1 and not is_terminal(body[0]) and body[0] not in closure:
+                        closure.add(body[0])
+                        queue.append(body[0])
+            for symbol in closure:
+                for body in by_head.get(symbol, ()):
+                    if len(body) == 2 or is_terminal(body[0]):
+                        key = (head, tuple(body))
+                        if key not in seen:
+                            seen.add(key)
+                            cnf.append((head, list(body)))
+
+        if 'ST' in nullable:
+            cnf.append(('ST', ['']))
+        cnf.sort(key=lambda rule: (rule[0] != 'ST', rule[1] != ['']))      # Regles de 'ST' al principi (l'epsilon la primera)
+
+        # Elimina els símbols inútils
+        kept = useful_rules(cnf, 'ST')
+        if kept:
+            self.removed_rules = len(cnf) - len(kept)
+            cnf = [cnf[idx] for idx in kept]
+        self.epsilon = 'ST' in nullable
+        self.cnf_grammar = cnf
+        return self.cnf_grammar
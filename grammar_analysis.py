@@ -0,0 +1,304 @@
+import heapq
+from collections import defaultdict
+
+
+def is_terminal(symbol):
+    '''
+    Comprova si un símbol del body d'una regla és terminal (lletra minúscula) o epsilon.
+
+    Paràmetres:
+        symbol (str): El símbol a comprovar.
+
+    Retorna:
+        bool: True si el símbol és terminal o epsilon, False si és un no terminal.
+    '''
+    return symbol.islower() or symbol == ''
+
+
+def generating_symbols(rules):
+    '''
+    Calcula els no terminals que generen alguna paraula de terminals.
+    Cada regla es visita un cop per cada símbol del body (cost lineal en la mida de la gramàtica).
+
+    Paràmetres:
+        rules (list): Les regles de la gramàtica, de la forma (No terminal, [Body de la regla]).
+
+    Retorna:
+        set: El conjunt de no terminals que generen alguna paraula.
+    '''
+    pending = []                        # Nombre de no terminals del body que encara no se sap si generen, per regla
+    users = defaultdict(list)           # No terminal -> índexs de les regles on apareix al body
+    generating = set()
+    queue = []
+    for idx, (head, body) in enumerate(rules):
+        non_terminals = [symbol for symbol in body if not is_terminal(symbol)]
+        pending.append(len(non_terminals))
+        for symbol in non_terminals:
+            users[symbol].append(idx)
+        if not non_terminals and head not in generating:
+            generating.add(head)
+            queue.append(head)
+
+    while queue:                        # Quan un no terminal genera, les regles on apareix tenen un símbol pendent menys
+        symbol = queue.pop()
+        for idx in users[symbol]:
+            pending[idx] -= 1
+            head = rules[idx][0]
+            if pending[idx] == 0 and head not in generating:
+                generating.add(head)
+                queue.append(head)
+    return generating
+
+
+def reachable_symbols(rules, start):
+    '''
+    Calcula els no terminals que es poden assolir des del símbol inicial.
+
+    Paràmetres:
+        rules (list): Les regles de la gramàtica, de la forma (No terminal, [Body de la regla]).
+        start (str): El símbol inicial.
+
+    Retorna:
+        set: El conjunt de no terminals assolibles (inclou el símbol inicial).
+    '''
+    bodies = defaultdict(list)
+    for head, body in rules:
+        bodies[head].append(body)
+    reachable = {start}
+    queue = [start]
+    while queue:
+        for body in bodies[queue.pop()]:
+            for symbol in body:
+                if not is_terminal(symbol) and symbol not in reachable:
+                    reachable.add(symbol)
+                    queue.append(symbol)
+    return reachable
+
+
+def useful_rules(rules, start):
+    '''
+    Selecciona les regles que només fan servir símbols útils: primer s'eliminen les regles amb algun no terminal
+    que no genera cap paraula i després les que tenen el head inassolible des del símbol inicial.
+
+    Paràmetres:
+        rules (list): Les regles de la gramàtica, de la forma (No terminal, [Body de la regla]).
+        start (str): El símbol inicial.
+
+    Retorna:
+        list: Els índexs (en ordre) de les regles que es conserven.
+    '''
+    generating = generating_symbols(rules)
+    kept = [idx for idx, (head, body) in enumerate(rules)
+            if head in generating and all(is_terminal(symbol) or symbol in generating for symbol in body)]
+    reachable = reachable_symbols([rules[idx] for idx in kept], start)
+    return [idx for idx in kept if rules[idx][0] in reachable]
+
+
+def first_last_sets(rules):
+    '''
+    Calcula, per a cada no terminal d'una gramàtica en CNF, els terminals amb què pot començar i acabar una paraula generada.
+
+    Paràmetres:
+        rules (list): Les regles de la gramàtica en CNF, de la forma (No terminal, [Body de la regla]).
+
+    Retorna:
+        tuple: Dos diccionaris no terminal -> conjunt de terminals (FIRST i LAST).
+    '''
+    first, last = defaultdict(set), defaultdict(set)
+    first_parents, last_parents = defaultdict(set), defaultdict(set)        # B -> A amb A -> B C, i C -> A amb A -> B C
+    for head, body in rules:
+        if len(body) == 1 and body[0] != '':
+            first[head].add(body[0])
+            last[head].add(body[0])
+        elif len(body) == 2:
+            first_parents[body[0]].add(head)
+            last_parents[body[1]].add(head)
+
+    for sets, parents in ((first, first_parents), (last, last_parents)):
+        queue = list(sets)
+        while queue:                        # Propaga els terminals cap als heads fins que no canvia cap conjunt
+            symbol = queue.pop()
+            for head in parents[symbol]:
+                if not sets[symbol] <= sets[head]:
+                    sets[head] |= sets[symbol]
+                    queue.append(head)
+    return dict(first), dict(last)
+
+
+def boundary_children(rules):
+    '''
+    Calcula, per a cada terminal t, els no terminals B que poden ser el fill esquerre d'una regla A -> B C quan la paraula
+    de C comença per t, i els no terminals C que poden ser el fill dret quan la paraula de B acaba per t. A la casella (i, j)
+    i el punt de tall k, CKY només ha de provar els B de (i, k) del conjunt de word[k] i els C de (k, j) del de word[k-1].
+
+    Paràmetres:
+        rules (list): Les regles de la gramàtica en CNF, de la forma (No terminal, [Body de la regla]).
+
+    Retorna:
+        tuple: Dos diccionaris terminal -> frozenset de no terminals (fills esquerres i fills drets). El valor és None
+               si el conjunt conté tots els fills d'alguna regla binària, és a dir, si no cal filtrar.
+    '''
+    rules = [(head, body) for head, body in rules if list(body) != ['']]
+    first, last = first_last_sets(rules)
+    all_left, all_right = set(), set()
+    left_children, right_children = defaultdict(set), defaultdict(set)
+    for _, body in rules:
+        if len(body) == 2:
+            B, C = body
+            all_left.add(B)
+            all_right.add(C)
+            for terminal in first.get(C, ()):
+                left_children[terminal].add(B)
+            for terminal in last.get(B, ()):
+                right_children[terminal].add(C)
+    terminals = {body[0] for _, body in rules if len(body) == 1}
+    return ({terminal: None if left_children[terminal] >= all_left else frozenset(left_children[terminal]) for terminal in terminals},
+            {terminal: None if right_children[terminal] >= all_right else frozenset(right_children[terminal]) for terminal in terminals})
+
+
+def min_lengths(rules):
+    '''
+    Calcula la longitud mínima de les paraules que genera cada no terminal d'una gramàtica en CNF
+    (algorisme de Knuth, una generalització del de Dijkstra).
+
+    Paràmetres:
+        rules (list): Les regles de la gramàtica en CNF, de la forma (No terminal, [Body de la regla]).
+
+    Retorna:
+        dict: Un diccionari no terminal -> longitud mínima (només pels no terminals que generen alguna paraula).
+    '''
+    pending = []                        # Nombre de símbols del body encara sense longitud mínima definitiva, per regla
+    users = defaultdict(list)           # No terminal -> índexs de les regles on apareix al body
+    heap = []
+    for idx, (head, body) in enumerate(rules):
+        if len(body) == 2:
+            pending.append(2 if body[0] != body[1] else 1)
+            for symbol in set(body):
+                users[symbol].append(idx)
+        else:
+            pending.append(0)
+            heapq.heappush(heap, (0 if body[0] == '' else 1, head))
+
+    lengths = {}
+    while heap:
+        length, symbol = heapq.heappop(heap)
+        if symbol in lengths:
+            continue
+        lengths[symbol] = length        # La primera vegada que surt del heap la longitud és mínima
+        for idx in users[symbol]:
+            pending[idx] -= 1
+            if pending[idx] == 0:
+                head, (B, C) = rules[idx]
+                if head not in lengths:
+                    heapq.heappush(heap, (lengths[B] + lengths[C], head))
+    return lengths
+
+
+def max_length(rules, start):
+    '''
+    Calcula la longitud màxima de les paraules que genera el símbol inicial d'una gramàtica en CNF amb només símbols útils.
+
+    Paràmetres:
+        rules (list): Les regles útils de la gramàtica en CNF, de la forma (No terminal, [Body de la regla]).
+        start (str): El símbol inicial.
+
+    Retorna:
+        int: La longitud màxima, o None si la gramàtica és recursiva (el llenguatge és infinit).
+    '''
+    bodies = defaultdict(list)
+    for head, body in rules:
+        bodies[head].append(body)
+
+    lengths = {}
+    visiting = set()
+    stack = [start]
+    while stack:                        # Recorregut en profunditat sense recursivitat; un cicle vol dir llenguatge infinit
+        symbol = stack[-1]
+        if symbol in lengths:
+            stack.pop()
+            continue
+        children = [child for body in bodies[symbol] if len(body) == 2 for child in body if child not in lengths]
+        if symbol in visiting and not children:
+            lengths[symbol] = max(len(body[0]) if len(body) == 1 else lengths[body[0]] + lengths[body[1]]
+                                  for body in bodies[symbol])
+            visiting.discard(symbol)
+            stack.pop()
+            continue
+        for child in children:
+            if child in visiting:
+                return None
+        visiting.add(symbol)
+        stack.extend(children)
+    return lengths.get(start, 0)
+
+
+class WordFilter:
+
+    def __init__(self, rules, start):
+        """
+        Inicialitza la classe. Calcula un cop per gramàtica unes condicions necessàries perquè una paraula
+        pertanyi al llenguatge, que es poden comprovar en temps lineal abans de construir la taula CKY.
+
+        Paràmetres:
+            rules (list): Les regles de la gramàtica en CNF, de la forma (No terminal, [Body de la regla]).
+            start (str): El símbol inicial.
+        """
+        rules = [rules[idx] for idx in useful_rules(rules, start)]         # Només les regles amb símbols útils
+        self.epsilon = any(head == start and list(body) == [''] for head, body in rules)       # El símbol inicial genera la paraula buida
+        rules = [(head, body) for head, body in rules if list(body) != ['']]                    # La resta de càlculs són per paraules no buides
+        self.alphabet = {body[0] for _, body in rules if len(body) == 1}    # Terminals que genera alguna regla útil
+        first, last = first_last_sets(rules)
+        self.start_first = first.get(start, set())                          # Terminals amb què pot començar una paraula del llenguatge
+        self.start_last = last.get(start, set())                            # Terminals amb què pot acabar una paraula del llenguatge
+        self.min_length = min_lengths(rules).get(start)                     # None si el llenguatge no té paraules no buides
+        self.max_length = max_length(rules, start) if self.min_length is not None else 0     # None si el llenguatge és infinit
+
+
+    def state(self):
+        '''
+        Retorna les condicions del filtre en un diccionari serialitzable en JSON (vegeu from_state).
+        '''
+        return {'epsilon': self.epsilon, 'alphabet': sorted(self.alphabet), 'start_first': sorted(self.start_first),
+                'start_last': sorted(self.start_last), 'min_length': self.min_length, 'max_length': self.max_length}
+
+
+    @classmethod
+    def from_state(cls, state):
+        '''
+        Reconstrueix un filtre a partir del diccionari de state, sense tornar a analitzar la gramàtica.
+
+        Paràmetres:
+            state (dict): Les condicions del filtre.
+
+        Retorna:
+            WordFilter: El filtre.
+        '''
+        word_filter = cls.__new__(cls)
+        word_filter.epsilon = state['epsilon']
+        word_filter.alphabet = set(state['alphabet'])
+        word_filter.start_first = set(state['start_first'])
+        word_filter.start_last = set(state['start_last'])
+        word_filter.min_length = state['min_length']
+        word_filter.max_length = state['max_length']
+        return word_filter
+
+
+    def accepts(self, word):
+        '''
+        Comprova les condicions necessàries perquè la paraula pertanyi al llenguatge.
+
+        Paràmetres:
+            word (str): La paraula a comprovar.
+
+        Retorna:
+            bool: False si és segur que la paraula no pertany al llenguatge, True si pot pertànyer-hi.
+        '''
+        if not word:
+            return self.epsilon
+        if self.min_length is None or len(word) < self.min_length:
+            return False
+        if self.max_length is not None and len(word) > self.max_length:
+            return False
+        if word[0] not in self.start_first or word[-1] not in self.start_last:
+            return False
+        return set(word) <= self.alphabet
@@ -0,0 +1,150 @@
+import copy
+import hashlib
+import json
+import os
+import pickle
+from converter import FastCNFConverter
+from cky import CKY
+from cky_probabilistic import ProbabilisticCKY
+
+
+CACHE_VERSION = 4           # Format de les entrades (gramàtica en CNF i índexs de compile_grammar); les entrades d'un altre format no es fan servir
+
+
+class GrammarCache:
+
+    def __init__(self, directory='.cky_cache', max_bytes=256 * 2 ** 20):
+        """
+        Inicialitza la classe. Cau en disc de gramàtiques convertides a CNF i dels índexs compilats dels analitzadors,
+        indexada per un hash del contingut de la gramàtica original. Només es guarden dades (llistes, diccionaris i conjunts),
+        no objectes dels analitzadors, així que les entrades no depenen dels atributs de les classes. Quan la mida total supera max_bytes,
+        s'eliminen les entrades que fa més temps que no es fan servir (LRU).
+
+        Paràmetres:
+            directory (str): Directori on es guarden les entrades (per defecte '.cky_cache').
+            max_bytes (int): Mida màxima del directori en bytes (per defecte 256 MiB).
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+
+    @staticmethod
+    def key(grammar, probabilistic=False, engine=None, converter=FastCNFConverter):
+        '''
+        Calcula la clau d'una gramàtica: el hash SHA-256 d'una representació canònica de les regles (en ordre,
+        perquè el símbol inicial és el head de la primera regla), de l'analitzador que es vol construir i del
+        convertidor a CNF (convertidors diferents poden donar gramàtiques diferents).
+
+        Paràmetres:
+            grammar (list): La gramàtica original (amb o sense probabilitats).
+            probabilistic (bool): Indica si la gramàtica és probabilística o no (per defecte és False).
+            engine (type): Classe de l'analitzador (per defecte CKY o ProbabilisticCKY).
+            converter (type): Classe del convertidor a CNF (per defecte FastCNFConverter).
+
+        Retorna:
+            str: La clau en hexadecimal.
+        '''
+        if probabilistic:
+            rules = [[rule[0], list(rule[1]), prob] for rule, prob in grammar]
+        else:
+            rules = [[head, list(body)] for head, body in grammar]
+        engine = engine or (ProbabilisticCKY if probabilistic else CKY)
+        canonical = json.dumps([CACHE_VERSION, engine.__module__, engine.__qualname__, converter.__module__, converter.__qualname__,
+                                probabilistic, rules], ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+
+    def load(self, key):
+        '''
+        Llegeix una entrada de la cau i en marca l'ús (data de modificació) per a la política LRU.
+
+        Paràmetres:
+            key (str): La clau de l'entrada.
+
+        Retorna:
+            tuple: (gramàtica en CNF, índexs compilats), o None si l'entrada no existeix o no es pot llegir.
+        '''
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                entry = pickle.load(file)
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        return entry
+
+
+    def store(self, key, cnf_grammar, indexes):
+        '''
+        Guarda una entrada a la cau (de manera atòmica) i elimina les entrades més antigues si cal.
+
+        Paràmetres:
+            key (str): La clau de l'entrada.
+            cnf_grammar (list): La gramàtica en CNF.
+            indexes (tuple): Els índexs compilats de l'analitzador (lexicon i binary_rules).
+        '''
+        path = self.path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as file:
+            pickle.dump((cnf_grammar, indexes), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        self.evict()
+
+
+    def evict(self):
+        '''
+        Elimina les entrades que fa més temps que no es fan servir fins que la mida total és com a màxim max_bytes.
+        '''
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pickle'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+
+    def get_parser(self, grammar, probabilistic=False, engine=None, converter=FastCNFConverter):
+        '''
+        Retorna la gramàtica en CNF i l'analitzador d'una gramàtica. Si la gramàtica ja és a la cau, l'analitzador es
+        construeix amb els índexs guardats; si no, es converteix la gramàtica a CNF (només si cal), es construeix
+        l'analitzador i es guarden la gramàtica convertida i els índexs.
+
+        Paràmetres:
+            grammar (list): La gramàtica original (amb o sense probabilitats).
+            probabilistic (bool): Indica si la gramàtica és probabilística o no (per defecte és False).
+            engine (type): Classe de l'analitzador (per defecte CKY o ProbabilisticCKY).
+            converter (type): Classe del convertidor a CNF (per defecte FastCNFConverter).
+
+        Retorna:
+            tuple: La gramàtica en CNF i l'analitzador.
+        '''
+        engine = engine or (ProbabilisticCKY if probabilistic else CKY)
+        key = self.key(grammar, probabilistic, engine, converter)
+        entry = self.load(key)
+        if entry is not None:
+            cnf_grammar, indexes = entry
+            return cnf_grammar, engine(cnf_grammar, indexes=indexes)
+
+        if converter(grammar, prob=probabilistic).is_cnf():
+            cnf_grammar = grammar
+        else:
+            cnf_grammar = converter(copy.deepcopy(grammar), prob=probabilistic).converter()      # El convertidor modifica les regles
+        parser = engine(cnf_grammar)
+        self.store(key, cnf_grammar, (parser.lexicon, parser.binary_rules))
+        return cnf_grammar, parser
@@ -0,0 +1,184 @@
+import json
+import mmap
+import struct
+from array import array
+from collections.abc import Sequence
+from grammar_analysis import WordFilter, boundary_children
+
+
+MAGIC = b'CKYG'
+VERSION = 3
+BYTE_ORDER = 0x01020304                 # Es llegeix diferent si el fitxer s'ha escrit en una màquina amb un altre ordre de bytes
+HEADER = struct.Struct('=4sIIIIIII')    # magic, versió, ordre de bytes, tipus de les probabilitats, nombre de símbols, nombre de regles, mida de la taula de símbols, mida de l'anàlisi
+
+
+def _align(offset, size=8):
+    return (offset + size - 1) // size * size
+
+
+def write_grammar(path, grammar, probabilistic=False, precision='d'):
+    '''
+    Escriu una gramàtica en CNF en format binari. El fitxer conté una capçalera, la taula de símbols (cadenes UTF-8
+    separades per '\\0'), un array d'enters de 32 bits amb (head, B, C) per a cada regla (C = -1 a les regles terminals)
+    i, si la gramàtica és probabilística, un array amb les probabilitats i un array de float64 amb la probabilitat total
+    de cada regla (la suma de totes les aparicions de la regla, a la primera aparició, i -1 a les repeticions).
+    Els arrays estan alineats a 8 bytes. Al final hi ha, en JSON, l'anàlisi de la gramàtica que fan servir els
+    analitzadors (el WordFilter i els fills de boundary_children), perquè carregar el fitxer no hagi de recórrer les regles.
+
+    Paràmetres:
+        path (str): Ruta del fitxer.
+        grammar (list): La gramàtica en CNF (amb o sense probabilitats).
+        probabilistic (bool): Indica si la gramàtica és probabilística o no (per defecte és False).
+        precision (str): 'd' per guardar les probabilitats en float64 (resultats idèntics) o 'f' per fer-ho en float32.
+    '''
+    if precision not in ('f', 'd'):
+        raise ValueError(f"Precisió no vàlida: {precision!r} (ha de ser 'f' o 'd')")
+    index = {}
+    rules = array('i')
+    probabilities = array(precision)
+    totals = array('d')
+    first = {}                          # (head, B, C) -> posició de la primera aparició de la regla
+    for rule in grammar:
+        if probabilistic:
+            (head, body), prob = rule
+        else:
+            head, body = rule
+        if len(body) not in (1, 2):
+            raise ValueError(f"La regla {head} -> {body} no està en CNF")
+        ids = []
+        for symbol in [head] + list(body):
+            if symbol not in index:
+                index[symbol] = len(index)
+            ids.append(index[symbol])
+        ids = tuple(ids) if len(ids) == 3 else (ids[0], ids[1], -1)
+        rules.extend(ids)
+        if probabilistic:
+            probabilities.append(prob)
+            prob = probabilities[-1]    # Es suma la probabilitat tal com es guarda (amb la precisió del fitxer)
+            if ids in first:
+                totals[first[ids]] += prob
+                totals.append(-1.0)
+            else:
+                first[ids] = len(totals)
+                totals.append(prob)
+
+    strings = '\0'.join(index).encode('utf-8')
+    plain_rules = [rule for rule, _ in grammar] if probabilistic else grammar
+    left_children, right_children = boundary_children(plain_rules)
+    children = lambda sets: {terminal: None if heads is None else sorted(heads) for terminal, heads in sets.items()}
+    analysis = json.dumps({'word_filter': WordFilter(plain_rules, plain_rules[0][0]).state(),
+                           'left_children': children(left_children), 'right_children': children(right_children)},
+                          ensure_ascii=False).encode('utf-8')
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER, ord(precision) if probabilistic else 0, len(index), len(rules) // 3, len(strings), len(analysis)))
+        file.write(strings)
+        for block in (rules, probabilities, totals) if probabilistic else (rules,):
+            file.write(b'\0' * (_align(file.tell()) - file.tell()))
+            file.write(block.tobytes())
+        file.write(analysis)
+
+
+class GrammarFile(Sequence):
+
+    def __init__(self, path):
+        """
+        Inicialitza la classe. Obre un fitxer escrit per write_grammar amb mmap: només es descodifica la taula de
+        símbols, i les regles i les probabilitats es llegeixen directament de les pàgines del fitxer (que el sistema
+        operatiu comparteix entre tots els processos que l'obren).
+
+        Es comporta com la llista de regles de la gramàtica (les regles es construeixen a mesura que es demanen),
+        així que es pot fer servir a qualsevol lloc on es fa servir una gramàtica. Els analitzadors que ho aprofiten
+        llegeixen directament els arrays heads, lefts, rights, probabilities i totals (vegeu write_grammar), i l'anàlisi
+        de la gramàtica guardada al fitxer (vegeu word_filter i boundary_children).
+
+        Paràmetres:
+            path (str): Ruta del fitxer.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byte_order, precision, num_symbols, num_rules, strings_size, analysis_size = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} no és un fitxer de gramàtica vàlid")
+        if byte_order != BYTE_ORDER:
+            raise ValueError(f"{path} s'ha escrit amb un altre ordre de bytes")
+
+        view = memoryview(self.mmap)
+        self.symbols = str(view[HEADER.size:HEADER.size + strings_size], 'utf-8').split('\0')
+        if len(self.symbols) != num_symbols:
+            raise ValueError(f"{path} té una taula de símbols incorrecta")
+        position = _align(HEADER.size + strings_size)
+
+        self.rules = view[position:position + 12 * num_rules].cast('i')       # (head, B, C) per a cada regla, C = -1 a les regles terminals
+        self.heads = self.rules[0::3]
+        self.lefts = self.rules[1::3]
+        self.rights = self.rules[2::3]
+        end = position + 12 * num_rules
+        self.probabilistic = precision != 0
+        self.probabilities = self.totals = None
+        if precision:
+            position = _align(end)
+            end = position + struct.calcsize(chr(precision)) * num_rules
+            self.probabilities = view[position:end].cast(chr(precision))
+            position = _align(end)
+            end = position + 8 * num_rules
+            self.totals = view[position:end].cast('d')                      # Probabilitat total de cada regla, -1 a les repeticions
+        self.analysis = json.loads(str(view[end:end + analysis_size], 'utf-8'))     # Ve just després de l'últim array
+        view.release()
+
+
+    def word_filter(self):
+        '''
+        Retorna el WordFilter de la gramàtica, llegit del fitxer.
+        '''
+        return WordFilter.from_state(self.analysis['word_filter'])
+
+
+    def boundary_children(self):
+        '''
+        Retorna els fills esquerres i drets de cada terminal de la frontera (vegeu grammar_analysis.boundary_children), llegits del fitxer.
+        '''
+        children = lambda sets: {terminal: None if heads is None else frozenset(heads) for terminal, heads in sets.items()}
+        return children(self.analysis['left_children']), children(self.analysis['right_children'])
+
+
+    def __len__(self):
+        return len(self.heads)
+
+
+    def rule(self, idx):
+        symbols = self.symbols
+        right = self.rights[idx]
+        body = [symbols[self.lefts[idx]]] if right < 0 else [symbols[self.lefts[idx]], symbols[right]]
+        return symbols[self.heads[idx]], body
+
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[position] for position in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('index out of range')
+        if self.probabilistic:
+            return self.rule(idx), self.probabilities[idx]
+        return self.rule(idx)
+
+
+    def __iter__(self):
+        symbols = self.symbols
+        for idx, (head, left, right) in enumerate(zip(self.heads, self.lefts, self.rights)):
+            rule = (symbols[head], [symbols[left]] if right < 0 else [symbols[left], symbols[right]])
+            yield (rule, self.probabilities[idx]) if self.probabilistic else rule
+
+
+    def __reduce__(self):
+        return GrammarFile, (self.path,)        # Els processos que el reben tornen a obrir el fitxer (i en comparteixen les pàgines)
+
+
+    def close(self):
+        for view in (self.heads, self.lefts, self.rights, self.rules, self.probabilities, self.totals):
+            if view is not None:
+                view.release()
+        self.mmap.close()
@@ -9,6 +9,20 @@ class GenerateGrammar:
         """
         self.grammar_dict = defaultdict(list)   # Diccionari on les claus són no terminals i els valors són llistes de símbols (terminals i no terminals)
         self.all_non_terminal_body = []         # Llista per emmagatzemar tots els símbols no terminals que apareguin en els bodies de les regles
+        self.generated_by = defaultdict(set)    # Índex invers: no terminal -> heads de les regles on apareix al body (es manté a add_rule)
+
+    def add_rule(self, head, body):
+        """
+        Afegeix una regla al diccionari de la gramàtica i actualitza l'índex invers dels no terminals del body.
+
+        Paràmetres:
+            head (str): El no terminal del head.
+            body (list): El body de la regla.
+        """
+        self.grammar_dict[head].append(body)
+        for symbol in body:
+            if not symbol.islower() and symbol != '':
+                self.generated_by[symbol].add(head)
 
     def generate_epsilon(self):
         """
@@ -48,11 +62,12 @@ class GenerateGrammar:
         if random.random() < 0.5:                           # Té 50% de probabilitats de generar un terminal i 50% de probabilitats de generar 2 no terminals en el body
             body = [self.generate_terminal()]               # Genera un terminal com a body
         else:
+            generators = self.find_generators(head)         # Els generadors del head no canvien mentre es tria el body
             nt1 = self.generate_nonterminal()               # Genera dos no terminals com a body, comprovant que els creats no siguin igual que el head ni que hagin generat el head, per evitar bucles
-            while nt1 == head or nt1 in self.find_generators(head):
+            while nt1 == head or nt1 in generators:
                 nt1 = self.generate_nonterminal()
             nt2 = self.generate_nonterminal()
-            while nt2 == head or nt2 in self.find_generators(head):
+            while nt2 == head or nt2 in generators:
                 nt2 = self.generate_nonterminal()
             body = [nt1, nt2]
 
@@ -90,6 +105,7 @@ class GenerateGrammar:
         """
         Troba tots els no terminals que generen el no terminal donat,
         incloent els generadors dels generadors de manera recursiva.
+        Fa servir l'índex invers, així que només visita els generadors i no tota la gramàtica.
 
         Paràmetres:
             nonterminal (str): No terminal per trobar els seus generadors.
@@ -102,11 +118,10 @@ class GenerateGrammar:
 
         while to_process:                                                   # Mentres hi hagi no terminals per processar
             current = to_process.pop()                                      # Extreu un nop terminal del conjunt per processar-lo
-            for head, rule_bodies in self.grammar_dict.items():             # Recorre el diccionari
-                for rule_body in rule_bodies:                               # Recorre els bodies
-                    if current in rule_body and head not in generators:     # Comprova si el no terminal que s'està processant coincideix amb algun símbol
-                        generators.add(head)                                # Si encara no està al conjunt, l'afegeix
-                        to_process.add(head)                                # L'afegeix també a to_process per seguir mirant, ja que sinó no s'eviten tots els bucles 
+            for head in self.generated_by[current]:                         # Recorre els heads de les regles on apareix al body
+                if head not in generators:                                  # Si encara no està al conjunt, l'afegeix
+                    generators.add(head)
+                    to_process.add(head)                                    # L'afegeix també a to_process per seguir mirant, ja que sinó no s'eviten tots els bucles
 
         return generators
 
@@ -144,7 +159,7 @@ class GenerateGrammar:
             if nt1 != nt2:
                 self.all_non_terminal_body.append(nt2)      # Afegeix el segon no terminal del body (si és igual que el primer, no s'afegirà)
 
-        self.grammar_dict[head].append(body)                # Afegeix la regla al diccionari
+        self.add_rule(head, body)                           # Afegeix la regla al diccionari
         self.all_non_terminal_body.append(head)             # Afegeix el head a la llista de no terminals
     
 
@@ -154,7 +169,7 @@ class GenerateGrammar:
             else:                                               # En cas que no s'hagi triat CNF
                 head, body = self.generate_non_cnf_rules()      # Genera un regla que no està en CNF
             
-            self.grammar_dict[head].append(body)                # S'afegeix la regla al diccionari
+            self.add_rule(head, body)                           # S'afegeix la regla al diccionari
 
             for symbol in body:                                 # Per cada símbol del body afegit
                 if not symbol.islower() and symbol != '' and symbol:     # Comprova que el símbol sigui un no terminal i no estigui ja a la llista
@@ -166,7 +181,7 @@ class GenerateGrammar:
                     new_body = [self.generate_terminal()]       # Si és CNF, genera un no terminal
                 else:
                     new_body = [random.choice([self.generate_terminal(), self.generate_epsilon()])]  # Si no és CNF, genera un terminal o un epsilon
-                self.grammar_dict[non_terminal].append(new_body) # Afegeix una nova regla en la que el símbol sigui el head i el body un terminal o un epsilon
+                self.add_rule(non_terminal, new_body)            # Afegeix una nova regla en la que el símbol sigui el head i el body un terminal o un epsilon
 
 
         grammar = []                                                            # Inicialitza una llista buida per a emmagatzemar la gramàtica que es retornarà
@@ -193,3 +208,95 @@ class GenerateGrammar:
 
 
         return grammar                  # Retorna la gramàtica creada
+
+
+    def generate_large_grammar(self, num_non_terminals=1000, num_rules=10000, num_terminals=26, branching=0.5,
+                               cnf=True, probabilistic=False, recursive=False):
+        """
+        Genera una gramàtica aleatòria gran (per fer proves d'estrès dels analitzadors) amb els paràmetres donats.
+        Tots els no terminals generen alguna paraula (tenen una regla terminal) i són assolibles des del símbol inicial.
+
+        Si recursive és False, la gramàtica no té cicles: cada no terminal té un rang aleatori i els no terminals del body
+        han de tenir un rang més gran que el del head (el mateix que fa find_generators, però sense recórrer els generadors).
+
+        Paràmetres:
+            num_non_terminals (int): Nombre de no terminals (inclou el símbol inicial).
+            num_rules (int): Nombre de regles (com a mínim 2 * num_non_terminals - 1; no es generen regles repetides).
+            num_terminals (int): Mida de l'alfabet de terminals (lletres minúscules, també fora de l'ASCII si en calen més de 26).
+            branching (float): Proporció de regles que ramifiquen (dos no terminals en CNF, de 2 a 5 símbols si no és CNF).
+            cnf (bool): Si la gramàtica ha de ser en forma normal de Chomsky (CNF) o no.
+            probabilistic (bool): Si la gramàtica ha de tenir regles amb o sense probabilitats.
+            recursive (bool): Si es permeten regles recursives (el llenguatge pot ser infinit).
+
+        Retorna:
+            list: Llista de tuples representant la gramàtica, opcionalment amb probabilitats. La primera regla és del símbol inicial.
+        """
+        self.grammar_dict = defaultdict(list)
+        self.generated_by = defaultdict(set)
+        terminals = [letter for letter in map(chr, range(97, 0x250)) if letter.islower() and letter.upper().isupper()][:num_terminals]     # Sense lletres sense majúscula (p. ex. 'ª')
+        non_terminals = ['ST' if cnf else 'N0'] + [f"N{idx}" for idx in range(1, num_non_terminals)]
+        self.all_non_terminal_body = list(non_terminals)
+        rank = {symbol: (0 if idx == 0 else random.random()) for idx, symbol in enumerate(non_terminals)}   # El símbol inicial té el rang més petit
+        by_rank = sorted(non_terminals, key=rank.__getitem__)
+        position = {symbol: idx for idx, symbol in enumerate(by_rank)}
+        seen_rules = set()
+
+        def body_symbol(head):          # Un no terminal que es pot posar al body d'una regla del head
+            if recursive:
+                return random.choice(non_terminals[1:] or non_terminals)     # El símbol inicial no apareix a cap body
+            start = position[head] + 1
+            return by_rank[random.randrange(start, len(by_rank))] if start < len(by_rank) else None
+
+        def branching_body(head, first=None):
+            if cnf:
+                length = 2
+            else:
+                length = random.randint(2, 5)
+            body = [first] if first else []
+            while len(body) < length:
+                if cnf or random.random() < 0.7:
+                    symbol = body_symbol(head)
+                    if symbol is None:
+                        return None
+                    body.append(symbol)
+                else:
+                    body.append(random.choice(terminals))
+            return body
+
+        def terminal_body(head):
+            if cnf or random.random() < 0.9:
+                return [random.choice(terminals)]
+            if random.random() < 0.5:
+                return ['']                                             # Regla epsilon
+            symbol = body_symbol(head)
+            return [symbol] if symbol else [random.choice(terminals)]   # Regla unitària
+
+        def add(head, body):
+            if body is None or (head, tuple(body)) in seen_rules:
+                return False
+            seen_rules.add((head, tuple(body)))
+            self.add_rule(head, body)
+            return True
+
+        for symbol in non_terminals:                                    # Tots els no terminals generen alguna paraula
+            while not add(symbol, [random.choice(terminals)]):
+                pass
+        for symbol in by_rank[1:]:                                      # Tots els no terminals són assolibles des del símbol inicial
+            parent = by_rank[random.randrange(position[symbol])]
+            add(parent, branching_body(parent, first=symbol))
+
+        attempts = 0
+        while len(seen_rules) < num_rules and attempts < 20 * num_rules:           # seen_rules té una entrada per regla afegida
+            attempts += 1                                               # Limita els intents si la gramàtica ja no admet més regles diferents
+            head = random.choice(non_terminals)
+            add(head, branching_body(head) if random.random() < branching else terminal_body(head))
+
+        grammar = []
+        for head, body_list in self.grammar_dict.items():
+            if probabilistic:
+                probabilities = [random.uniform(0.01, 1) for _ in body_list]
+                total = sum(probabilities)
+                grammar.extend(((head, body), prob / total) for body, prob in zip(body_list, probabilities))     # Sense arrodonir: un head pot tenir moltes regles
+            else:
+                grammar.extend((head, body) for body in body_list)
+        return grammar
@@ -5,6 +5,7 @@ from cky import CKY
 from cky_probabilistic import ProbabilisticCKY
 from grammar_generator import GenerateGrammar
 from word_generator import GenerateWord
+from grammar_cache import GrammarCache
 
 
 
@@ -42,6 +43,7 @@ def executar_experiment(cnf, probabilistic, valid):
     else:                                                                   # Si la gramàtica no està en CNF, crida al mètode per a converir-la i s'imprimeix la gramàtica tarnsformada
         cnf_grammar = gram.converter()
         print("S'ha convertit a CNF amb èxit!")
+        print(f"S'han eliminat {gram.removed_rules} regles amb símbols inútils.")
         print("Aquesta és la gramàtica transformada:")
         for head, body in cnf_grammar:                                      # (només en cas que no sigui probabilística)
             print(f"({head}, {body})")
@@ -109,13 +111,12 @@ if __name__ == "__main__":
             for head, body in grammar:
                 print(f"({head}, {body})")
 
-        gram = CNFConverter(grammar, prob=prob)                         # Crea una instàncai de la classe CNFConverter
+        cache = GrammarCache()                                          # Cau en disc: si la gramàtica ja s'havia fet servir, no es torna a convertir ni compilar
+        cnf_grammar, parser = cache.get_parser(grammar, prob, converter=CNFConverter)
 
-        if gram.is_cnf():                                               # Si cal, transforma la gramàtica a CNF i s'imprimeix, sinó, indica a l'usuari que ja està en CNF
-            cnf_grammar = grammar
+        if cnf_grammar == grammar:                                      # Si cal, transforma la gramàtica a CNF i s'imprimeix, sinó, indica a l'usuari que ja està en CNF
             print("La gramàtica original ja està en CNF.")
         else:
-            cnf_grammar = gram.converter()
             print("S'ha convertit a CNF amb èxit!")
             print("Aquesta és la gramàtica transformada:")
             if prob:
@@ -130,15 +131,13 @@ if __name__ == "__main__":
         print(f"Aquesta és la paraula que es comprova: {word}")         # Mostra la paraula que es comprova
 
         if prob:                                                        # Si és probabilístic:
-            cky_prob = ProbabilisticCKY(cnf_grammar)                    # Crea una instància de la classe ProbabilisticCKY
-            result = cky_prob.parse(word)                               # Comprova si la paraula pertany i la seva probabilitat
+            result = parser.parse(word)                                 # Comprova si la paraula pertany i la seva probabilitat
             if result == False:                                         # Mostra el resultat
                 print("La paraula pertany al llenguatge de la gramàtica: ", result)
             else:
                 print("La paraula pertany al llenguatge de la gramàtica amb una probabilitat de: ", result)
         else:                                                           # Si no és probabilístic:
-            cky = CKY(cnf_grammar)                                      # Crea una instància de la classe CKY
-            result = cky.parse(word)                                    # Comprova si la paraula pertany a la gramàtica
+            result = parser.parse(word)                                 # Comprova si la paraula pertany a la gramàtica
             print("La paraula pertany al llenguatge de la gramàtica: ", result)      # Mostra el resultat   
 
     elif pregunta == '2':               # Si l'usuari escull l'opció 2:
@@ -0,0 +1,195 @@
+import os
+import itertools
+import math
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from cky import CKY
+from cky_probabilistic import ProbabilisticCKY
+
+
+_worker_parser = None       # Analitzador de cada procés, creat un sol cop per l'inicialitzador del pool
+
+
+def _init_worker(engine, grammar):
+    '''
+    Inicialitzador dels processos del pool: crea l'analitzador amb la gramàtica rebuda un sol cop per procés.
+
+    Paràmetres:
+        engine (type): Classe de l'analitzador (CKY, ProbabilisticCKY o una subclasse).
+        grammar (list): La gramàtica en CNF.
+    '''
+    global _worker_parser
+    _worker_parser = engine(grammar)
+
+
+def _parse_chunk(words, timed=False, log=False):
+    '''
+    Analitza un bloc de paraules amb l'analitzador del procés.
+
+    Paràmetres:
+        words (list): Les paraules del bloc.
+        timed (bool): Si és True, les paraules s'analitzen una a una i es retorna també el temps de cadascuna.
+        log (bool): Si és True, es retorna la log-probabilitat de parse_log en lloc del resultat de parse.
+
+    Retorna:
+        list: Els resultats (o parells (resultat, segons)) en el mateix ordre que les paraules.
+    '''
+    return parse_timed(_worker_parser, words, log) if timed else parse_words(_worker_parser, words, log)
+
+
+def defining_class(cls, name):
+    '''
+    Retorna la primera classe del MRO de cls que defineix l'atribut name (None si cap el defineix).
+    '''
+    return next((klass for klass in cls.__mro__ if name in vars(klass)), None)
+
+
+def parse_words(parser, words, log=False):
+    '''
+    Analitza les paraules amb parse_many (que comparteix els prefixos) si el parse_many de l'analitzador és de la
+    mateixa classe que el seu parse o d'una subclasse. Si una subclasse redefineix parse però no parse_many
+    (BitsetCKY, ValiantCKY, ViterbiCKY...), el parse_many heretat faria servir l'algorisme de la classe base,
+    així que les paraules s'analitzen una a una amb parse. Amb log passa el mateix amb parse_log (llevat del de
+    ProbabilisticCKY, que només aplica el logaritme al resultat de parse).
+
+    Paràmetres:
+        parser (object): L'analitzador.
+        words (list): Les paraules.
+        log (bool): Si és True, es retorna la log-probabilitat de parse_log en lloc del resultat de parse.
+
+    Retorna:
+        list: Els resultats de parse (o de parse_log) en el mateix ordre que les paraules.
+    '''
+    engine = type(parser)
+    many = defining_class(engine, 'parse_many')
+    singles = [defining_class(engine, 'parse')]
+    if log and defining_class(engine, 'parse_log') is not ProbabilisticCKY:    # ProbabilisticCKY.parse_log només passa parse a logaritme
+        singles.append(defining_class(engine, 'parse_log'))
+    if many is not None and all(issubclass(many, single) for single in singles):
+        results = parser.parse_many(words)
+        return [math.log(result) if result else -math.inf for result in results] if log else results
+    method = parser.parse_log if log else parser.parse
+    return [method(word) for word in words]
+
+
+def parse_timed(parser, words, log=False):
+    '''
+    Analitza les paraules una a una mesurant el temps de cadascuna (sense compartir prefixos com parse_many).
+
+    Paràmetres:
+        parser (object): L'analitzador.
+        words (list): Les paraules.
+        log (bool): Si és True, es fa servir parse_log en lloc de parse.
+
+    Retorna:
+        list: Parells (resultat de parse o parse_log, segons) en el mateix ordre que les paraules.
+    '''
+    method = parser.parse_log if log else parser.parse
+    results = []
+    for word in words:
+        started = time.perf_counter()
+        result = method(word)
+        results.append((result, time.perf_counter() - started))
+    return results
+
+
+class CorpusParser:
+
+    def __init__(self, grammar, probabilistic=False, engine=None, workers=None, chunk_size=256, min_parallel=1024):
+        """
+        Inicialitza la classe.
+
+        Paràmetres:
+            grammar (list): La gramàtica en CNF (amb o sense probabilitats).
+            probabilistic (bool): Indica si la gramàtica és probabilística o no (per defecte és False).
+            engine (type): Classe de l'analitzador; per defecte CKY o ProbabilisticCKY segons 'probabilistic'.
+            workers (int): Nombre de processos (per defecte el nombre de CPUs).
+            chunk_size (int): Nombre de paraules que s'envien a un procés de cop (per defecte 256).
+            min_parallel (int): Per sota d'aquest nombre de paraules s'analitzen dins el mateix procés (per defecte 1024).
+        """
+        self.grammar = grammar
+        self.engine = engine or (ProbabilisticCKY if probabilistic else CKY)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.min_parallel = min_parallel
+        self.parser = None          # Analitzador local, només es crea si cal
+        self.executor = None        # Pool de processos, només es crea si cal
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        '''
+        Atura el pool de processos (si s'ha creat).
+        '''
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+    def local_parser(self):
+        '''
+        Retorna l'analitzador del procés actual, creant-lo el primer cop.
+        '''
+        if self.parser is None:
+            self.parser = self.engine(self.grammar)
+        return self.parser
+
+
+    def parse(self, words, timed=False, log=False):
+        '''
+        Analitza un flux de paraules i en retorna els resultats en ordre a mesura que estan disponibles.
+        Si hi ha menys de min_parallel paraules, o només un procés, s'analitzen dins el procés actual.
+
+        Paràmetres:
+            words (iterable): Les paraules a analitzar (pot ser un generador).
+            timed (bool): Si és True, es retorna també el temps d'anàlisi de cada paraula (vegeu parse_timed).
+            log (bool): Si és True, es retorna la log-probabilitat de parse_log de cada paraula en lloc del resultat de parse.
+
+        Retorna:
+            generator: Els resultats de parse (o parells (resultat, segons)) de cada paraula, en el mateix ordre que l'entrada.
+        '''
+        words = iter(words)
+        first = list(itertools.islice(words, self.min_parallel))
+        if len(first) < self.min_parallel or self.workers == 1:      # Lot petit: no val la pena crear processos
+            for chunk in itertools.chain([first], iter(lambda: list(itertools.islice(words, self.chunk_size)), [])):
+                yield from parse_timed(self.local_parser(), chunk, log) if timed else parse_words(self.local_parser(), chunk, log)
+            return
+
+        if self.executor is None:       # La gramàtica s'envia a cada procés un sol cop, a través de l'inicialitzador
+            self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.engine, self.grammar))
+
+        chunks = itertools.chain(
+            (first[idx:idx + self.chunk_size] for idx in range(0, len(first), self.chunk_size)),
+            iter(lambda: list(itertools.islice(words, self.chunk_size)), []))
+        pending = deque()               # Blocs enviats i encara no retornats, limitats per no llegir tota l'entrada de cop
+        for chunk in chunks:
+            pending.append(self.executor.submit(_parse_chunk, chunk, timed, log))
+            if len(pending) >= 2 * self.workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def parse_corpus(grammar, words, probabilistic=False, **options):
+    '''
+    Analitza un flux de paraules amb un CorpusParser i en retorna els resultats en ordre.
+
+    Paràmetres:
+        grammar (list): La gramàtica en CNF (amb o sense probabilitats).
+        words (iterable): Les paraules a analitzar.
+        probabilistic (bool): Indica si la gramàtica és probabilística o no (per defecte és False).
+        options: Paràmetres addicionals de CorpusParser (engine, workers, chunk_size, min_parallel).
+
+    Retorna:
+        generator: Els resultats de parse de cada paraula, en el mateix ordre que l'entrada.
+    '''
+    with CorpusParser(grammar, probabilistic, **options) as corpus_parser:
+        yield from corpus_parser.parse(words)
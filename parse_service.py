@@ -0,0 +1,354 @@
+import asyncio
+import itertools
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from batch import build_parser, is_probabilistic, result_record
+from grammar_cache import GrammarCache
+from parallel_parser import parse_timed
+
+
+_worker_parsers = {}        # Analitzadors de cada procés del pool, per clau de gramàtica
+LINE_LIMIT = 1 << 26        # Mida màxima d'una línia del protocol (les peticions de registre porten tota la gramàtica)
+
+
+def _parse_batch(key, words, payload=None):
+    '''
+    Analitza un lot de paraules d'una gramàtica dins un procés del pool. L'analitzador es construeix el primer cop
+    que el procés rep la gramàtica i es reutilitza per a tots els lots següents amb la mateixa clau.
+
+    Paràmetres:
+        key (str): Clau de la gramàtica.
+        words (list): Les paraules del lot.
+        payload (tuple): (classe de l'analitzador, gramàtica en CNF), només cal si el procés encara no té l'analitzador.
+
+    Retorna:
+        list: Parells (resultat, segons) per a cada paraula, o None si el procés no té l'analitzador i no s'ha enviat payload.
+    '''
+    if key not in _worker_parsers:
+        if payload is None:
+            return None
+        engine, grammar = payload
+        _worker_parsers[key] = engine(grammar)
+    parser = _worker_parsers[key]
+    return parse_timed(parser, words, log=hasattr(parser, 'parse_log'))
+
+
+def _prepare_grammar(key, grammar, engine=None, cache_dir=None):
+    '''
+    Converteix una gramàtica a CNF (si cal) dins un procés del pool i hi deixa l'analitzador construït per als
+    lots següents, de manera que el procés del servidor no converteix ni compila cap gramàtica.
+
+    Paràmetres:
+        key (str): Clau de la gramàtica.
+        grammar (list): La gramàtica normalitzada.
+        engine (str): Nom de l'analitzador (vegeu batch.ENGINES).
+        cache_dir (str): Directori de la cau en disc de gramàtiques convertides (None per no fer-la servir).
+
+    Retorna:
+        tuple: (classe de l'analitzador, gramàtica en CNF), el payload de _parse_batch per als altres processos.
+    '''
+    cnf_grammar, engine_class, parser = build_parser(grammar, engine, cache_dir)
+    _worker_parsers[key] = parser
+    return engine_class, cnf_grammar
+
+
+def normalize_grammar(grammar):
+    '''
+    Converteix una gramàtica rebuda en JSON (llistes niades) al format de tuples que fan servir els analitzadors.
+    '''
+    if grammar and isinstance(grammar[0][0], (list, tuple)):
+        return [((rule[0][0], list(rule[0][1])), rule[1]) for rule in grammar]
+    return [(rule[0], list(rule[1])) for rule in grammar]
+
+
+class ParseService:
+
+    def __init__(self, workers=None, batch_window=0.005, max_batch=256, cache_dir=None):
+        """
+        Inicialitza la classe. Servei d'anàlisi de llarga durada: les gramàtiques es converteixen i es compilen un sol cop
+        (indexades pel hash del contingut) i les peticions que arriben durant batch_window segons s'agrupen en un sol lot,
+        que s'analitza en un pool de processos perquè el bucle d'esdeveniments no es bloquegi mai.
+
+        Paràmetres:
+            workers (int): Nombre de processos del pool (per defecte el nombre de CPUs).
+            batch_window (float): Temps màxim (en segons) que una petició espera altres peticions per formar un lot.
+            max_batch (int): Mida màxima d'un lot (si s'arriba a aquesta mida, el lot s'envia sense esperar).
+            cache_dir (str): Directori de la cau en disc de gramàtiques convertides (None per no fer-la servir).
+        """
+        self.workers = workers
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache_dir = cache_dir
+        self.grammars = {}          # Clau -> (classe de l'analitzador, gramàtica en CNF)
+        self.registrations = {}     # Clau -> future de la conversió en curs (els registres simultanis l'esperen tots)
+        self.queues = {}            # Clau -> llista de peticions pendents (paraula, future, instant d'arribada)
+        self.timers = {}            # Clau -> tasca que enviarà el lot quan s'acabi la finestra
+        self.executor = None
+        self.batches = 0            # Nombre de lots enviats (per veure l'efecte de l'agrupació)
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+    async def close(self):
+        '''
+        Envia els lots pendents, espera que s'acabin i atura el pool de processos.
+        '''
+        for key in list(self.queues):
+            if self.queues[key]:
+                await self.flush(key)
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+    def pool(self):
+        '''
+        Retorna el pool de processos, creant-lo el primer cop.
+        '''
+        if self.executor is None:
+            # Amb fork, els processos heretarien els sockets oberts de les connexions i aquestes no es tancarien mai
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+
+    async def register(self, grammar, engine=None):
+        '''
+        Registra una gramàtica: la converteix a CNF (si cal) un sol cop i en retorna la clau. Si ja estava registrada,
+        només en retorna la clau. La conversió es fa en un procés del pool (que es queda l'analitzador), així que no
+        bloqueja el bucle d'esdeveniments, i els registres simultanis de la mateixa gramàtica comparteixen la conversió.
+
+        Paràmetres:
+            grammar (list): La gramàtica (amb o sense probabilitats, en llistes o tuples).
+            engine (str): Nom de l'analitzador (vegeu batch.ENGINES); per defecte segons si la gramàtica té probabilitats.
+
+        Retorna:
+            str: La clau de la gramàtica.
+        '''
+        grammar = normalize_grammar(grammar)
+        key = GrammarCache.key(grammar, is_probabilistic(grammar)) + (f":{engine}" if engine else '')
+        if key not in self.grammars:
+            if key not in self.registrations:
+                self.registrations[key] = asyncio.get_running_loop().run_in_executor(
+                    self.pool(), _prepare_grammar, key, grammar, engine, self.cache_dir)
+            try:
+                self.grammars[key] = await self.registrations[key]
+            finally:
+                self.registrations.pop(key, None)
+        return key
+
+
+    async def parse(self, key, word):
+        '''
+        Analitza una paraula amb una gramàtica registrada. La petició s'afegeix al lot pendent de la gramàtica.
+
+        Paràmetres:
+            key (str): Clau retornada per register.
+            word (str): La paraula a analitzar.
+
+        Retorna:
+            dict: El resultat (word, accepted, probability, seconds) i les mètriques de latència en mil·lisegons:
+                  queued_ms (espera fins que s'envia el lot), latency_ms (total) i batch_size.
+        '''
+        if key not in self.grammars:
+            raise KeyError(f"Gramàtica no registrada: {key}")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self.queues.setdefault(key, [])
+        queue.append((word, future, time.perf_counter()))
+        if len(queue) >= self.max_batch:
+            self.cancel_timer(key)
+            loop.create_task(self.flush(key))
+        elif key not in self.timers:
+            self.timers[key] = loop.create_task(self.flush_later(key))
+        return await future
+
+
+    def cancel_timer(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+
+
+    async def flush_later(self, key):
+        await asyncio.sleep(self.batch_window)
+        self.timers.pop(key, None)
+        await self.flush(key)
+
+
+    async def flush(self, key):
+        '''
+        Envia totes les peticions pendents d'una gramàtica al pool de processos com un sol lot i en resol els resultats.
+
+        Paràmetres:
+            key (str): Clau de la gramàtica.
+        '''
+        batch, self.queues[key] = self.queues.get(key, []), []
+        if not batch:
+            return
+        self.batches += 1
+        loop = asyncio.get_running_loop()
+        words = [word for word, _, _ in batch]
+        dispatched = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(self.pool(), _parse_batch, key, words)
+            if results is None:         # El procés encara no té l'analitzador: es torna a enviar amb la gramàtica
+                results = await loop.run_in_executor(self.pool(), _parse_batch, key, words, self.grammars[key])
+        except Exception as error:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        finished = time.perf_counter()
+        log = hasattr(self.grammars[key][0], 'parse_log')
+        for (word, future, arrived), (result, seconds) in zip(batch, results):
+            if not future.done():
+                record = result_record(word, result, seconds, log)
+                record.update(queued_ms=(dispatched - arrived) * 1000, latency_ms=(finished - arrived) * 1000, batch_size=len(batch))
+                future.set_result(record)
+
+
+    async def handle_connection(self, reader, writer):
+        '''
+        Atén una connexió del protocol de línies JSON. Cada petició és un objecte amb 'id' i 'op':
+            {"id": 1, "op": "register", "grammar": [...], "engine": "cky"}  -> {"id": 1, "key": ...}
+            {"id": 2, "op": "parse", "key": ..., "word": "ab"}             -> {"id": 2, "result": {...}}
+        Les peticions d'una mateixa connexió s'atenen concurrentment (i es poden agrupar en un mateix lot), així que
+        les respostes poden arribar desordenades; l'id permet associar-les.
+        '''
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(request):
+            try:
+                if request.get('op') == 'register':
+                    response = {'key': await self.register(request['grammar'], request.get('engine'))}
+                elif request.get('op') == 'parse':
+                    response = {'result': await self.parse(request['key'], request['word'])}
+                else:
+                    response = {'error': f"Operació desconeguda: {request.get('op')}"}
+            except Exception as error:
+                response = {'error': f"{type(error).__name__}: {error}"}
+            response['id'] = request.get('id')
+            async with lock:
+                writer.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(answer(json.loads(line)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+
+    async def serve(self, host='127.0.0.1', port=0):
+        '''
+        Obre el servidor TCP local.
+
+        Paràmetres:
+            host (str): Adreça on s'escolta (per defecte només localhost).
+            port (int): Port (0 per triar-ne un de lliure).
+
+        Retorna:
+            asyncio.Server: El servidor (el port triat és a server.sockets[0].getsockname()[1]).
+        '''
+        return await asyncio.start_server(self.handle_connection, host, port, limit=LINE_LIMIT)
+
+
+class ParseClient:
+
+    def __init__(self, host='127.0.0.1', port=None):
+        """
+        Inicialitza la classe. Client asíncron del protocol de línies JSON de ParseService, pensat per fer-se servir
+        en el mateix procés (i bucle d'esdeveniments) que el servidor o des d'un altre procés local.
+
+        Paràmetres:
+            host (str): Adreça del servidor.
+            port (int): Port del servidor.
+        """
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+        self.pending = {}           # id -> future de la resposta
+        self.ids = itertools.count()
+        self.listener = None
+
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, limit=LINE_LIMIT)
+        self.listener = asyncio.create_task(self.listen())
+
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+        if self.listener is not None:
+            self.listener.cancel()
+
+
+    async def listen(self):
+        '''
+        Llegeix les respostes del servidor i resol les peticions corresponents. Quan la connexió es tanca,
+        les peticions que encara esperaven resposta fallen amb ConnectionError.
+        '''
+        try:
+            while line := await self.reader.readline():
+                response = json.loads(line)
+                future = self.pending.pop(response.pop('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            pending, self.pending = self.pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("El servidor ha tancat la connexió"))
+
+
+    async def request(self, **request):
+        if self.listener is None or self.listener.done():
+            raise ConnectionError("El client no està connectat")
+        request['id'] = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request['id']] = future
+        self.writer.write((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+        await self.writer.drain()
+        response = await future
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response
+
+
+    async def register(self, grammar, engine=None):
+        return (await self.request(op='register', grammar=grammar, engine=engine))['key']
+
+
+    async def parse(self, key, word):
+        return (await self.request(op='parse', key=key, word=word))['result']
+
+
+    async def parse_many(self, key, words):
+        '''
+        Envia totes les paraules de cop (el servidor les agrupa en lots) i en retorna els resultats en ordre.
+        '''
+        return await asyncio.gather(*(self.parse(key, word) for word in words))
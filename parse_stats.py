@@ -0,0 +1,67 @@
+class ParseStats:
+
+    def __init__(self):
+        """
+        Inicialitza la classe. Guarda les mesures d'una anàlisi CKY (es passa a parse(word, stats) i el mètode l'omple).
+
+        Atributs:
+            length (int): Longitud de la paraula.
+            filtered (bool): True si la paraula s'ha descartat abans de construir la taula.
+            non_empty_cells (int): Nombre de caselles de la taula amb algun no terminal.
+            probes (int): Nombre de consultes a l'índex de regles binàries, una per parella (B, C) de les caselles (i, k) i (k, j).
+            matches (int): Nombre de regles A -> B C aplicades (consultes amb èxit, comptant cada head).
+            peak_cell_size (int): Nombre màxim de no terminals d'una casella.
+            cache_hits (int): Nombre de caselles obtingudes de la cau de subparaules (si l'analitzador en té).
+            time_per_length (dict): Longitud de l'interval l -> temps en segons per omplir totes les caselles (i, i+l).
+
+        Els analitzadors que no omplen la taula casella a casella només guarden les mesures que tenen sentit per a
+        ells (vegeu el parse de cada analitzador); la resta es queden a 0.
+        """
+        self.length = 0
+        self.filtered = False
+        self.non_empty_cells = 0
+        self.probes = 0
+        self.matches = 0
+        self.peak_cell_size = 0
+        self.cache_hits = 0
+        self.time_per_length = {}
+
+
+    def add_cell(self, cell):
+        '''
+        Actualitza els comptadors de caselles amb una casella ja calculada.
+
+        Paràmetres:
+            cell (set o dict): La casella.
+        '''
+        self.add_cell_size(len(cell))
+
+
+    def add_cell_size(self, size):
+        '''
+        Com add_cell, per als analitzadors que no guarden les caselles com a conjunts (màscares de bits, arrays...).
+
+        Paràmetres:
+            size (int): Nombre de no terminals de la casella.
+        '''
+        if size:
+            self.non_empty_cells += 1
+            if size > self.peak_cell_size:
+                self.peak_cell_size = size
+
+
+    def total_time(self):
+        return sum(self.time_per_length.values())
+
+
+    def slowest_length(self):
+        '''
+        Retorna la longitud d'interval on s'ha passat més temps (None si no s'ha construït la taula).
+        '''
+        return max(self.time_per_length, key=self.time_per_length.get) if self.time_per_length else None
+
+
+    def __repr__(self):
+        return (f"ParseStats(length={self.length}, filtered={self.filtered}, non_empty_cells={self.non_empty_cells}, "
+                f"probes={self.probes}, matches={self.matches}, peak_cell_size={self.peak_cell_size}, cache_hits={self.cache_hits}, "
+                f"total_time={self.total_time():.6f})")
@@ -0,0 +1,74 @@
+import itertools
+import random
+import unittest
+from cky import CKY, BitsetCKY
+from cky_valiant import ValiantCKY
+from grammar_generator import GenerateGrammar
+from word_generator import LengthSampler
+
+
+SEEDS = range(8)
+LEAF_SIZES = (1, 2, 4, 16)
+ALPHABET = 'abc'
+
+
+def random_grammar(seed):
+    '''
+    Genera de manera reproduïble una gramàtica recursiva petita en CNF sobre l'alfabet 'abc'.
+    '''
+    random.seed(seed)
+    return GenerateGrammar().generate_large_grammar(8, 20, len(ALPHABET), 0.5, cnf=True, recursive=True)
+
+
+def sample_words(grammar, seed, max_length=16):
+    '''
+    Paraules de prova: totes les paraules de longitud com a màxim 4 i, per a longituds més grans (on ValiantCKY divideix
+    la taula en blocs), paraules de la gramàtica i les mateixes paraules amb un caràcter canviat (que sovint no hi pertanyen).
+    '''
+    rng = random.Random(seed)
+    words = [''.join(letters) for length in range(5) for letters in itertools.product(ALPHABET, repeat=length)]
+    random.seed(seed)
+    sampler = LengthSampler(grammar, max_length=max_length)
+    for length in range(5, max_length + 1):
+        for word in sampler.sample_many(3, length):
+            position = rng.randrange(length)
+            words += [word, word[:position] + rng.choice(ALPHABET) + word[position + 1:]]
+    return words
+
+
+class TestValiantCKY(unittest.TestCase):
+
+    def test_same_results_as_cky(self):
+        for seed in SEEDS:
+            grammar = random_grammar(seed)
+            words = sample_words(grammar, seed)
+            expected = [CKY(grammar).parse(word) for word in words]
+            self.assertTrue(any(expected) and not all(expected))
+            for leaf_size in LEAF_SIZES:
+                parser = ValiantCKY(grammar, leaf_size=leaf_size)
+                with self.subTest(seed=seed, leaf_size=leaf_size):
+                    self.assertEqual([parser.parse(word) for word in words], expected)
+
+
+    def test_small_blocks(self):
+        # Amb max_block petit els productes de cada bloc es fan en molts grups
+        grammar = random_grammar(0)
+        expected = CKY(grammar)
+        parser = ValiantCKY(grammar, leaf_size=2, max_block=64)
+        words = sample_words(grammar, 0, max_length=12)
+        self.assertEqual([parser.parse(word) for word in words], [expected.parse(word) for word in words])
+
+
+class TestBitsetCKY(unittest.TestCase):
+
+    def test_same_results_as_cky(self):
+        for seed in SEEDS:
+            grammar = random_grammar(seed)
+            expected, parser = CKY(grammar), BitsetCKY(grammar)
+            words = sample_words(grammar, seed)
+            with self.subTest(seed=seed):
+                self.assertEqual([parser.parse(word) for word in words], [expected.parse(word) for word in words])
+
+
+if __name__ == '__main__':
+    unittest.main()
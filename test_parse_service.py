@@ -0,0 +1,51 @@
+import asyncio
+import unittest
+from cky import CKY
+from parse_service import ParseClient, ParseService
+
+
+GRAMMAR = [('S', ['A', 'B']), ('S', ['a']), ('A', ['a']), ('B', ['b']), ('B', ['S', 'B'])]
+WORDS = ['ab', 'abb', 'aabb', 'a', 'b', '', 'ba', 'abab']
+
+
+class TestParseService(unittest.IsolatedAsyncioTestCase):
+
+    async def test_round_trip(self):
+        async with ParseService(workers=1, batch_window=0.05) as service:
+            server = await service.serve()
+            port = server.sockets[0].getsockname()[1]
+            try:
+                async with ParseClient(port=port) as client:
+                    key = await client.register(GRAMMAR)
+                    self.assertEqual(await client.register(GRAMMAR), key)
+                    results = await client.parse_many(key, WORDS)
+                    self.assertEqual([result['word'] for result in results], WORDS)
+                    self.assertEqual([result['accepted'] for result in results], [CKY(GRAMMAR).parse(word) for word in WORDS])
+                    self.assertTrue(all(result['batch_size'] == len(WORDS) for result in results))      # Un sol lot
+                    with self.assertRaisesRegex(RuntimeError, 'KeyError'):
+                        await client.parse('desconeguda', 'ab')
+            finally:
+                server.close()
+                await server.wait_closed()
+
+
+    async def test_closed_connection(self):
+        async def close_after_request(reader, writer):
+            await reader.readline()
+            writer.close()
+
+        server = await asyncio.start_server(close_after_request, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with ParseClient(port=port) as client:
+                with self.assertRaises(ConnectionError):
+                    await asyncio.wait_for(client.register(GRAMMAR), timeout=5)
+                with self.assertRaises(ConnectionError):
+                    await client.parse('clau', 'ab')
+        finally:
+            server.close()
+            await server.wait_closed()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,9 @@
 import random
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import accumulate
+from operator import mul
+from cky import BitsetCKY
 
 class GenerateWord:
 
@@ -13,6 +18,27 @@ class GenerateWord:
         """
         self.grammar = grammar                  # Assigna la gramàtica proporcionada a l'atribut de la classe
         self.probabilistic = probabilistic      # Assigna el valor de 'probabilistic' a l'atribut de la classe per saber si la gramàtica és probabilística o no
+        self.rules, self.cum_weights = self.compile_rules()     # Taules de regles per head, calculades un sol cop
+
+
+    def compile_rules(self):
+        """
+        Agrupa els bodies de les regles per head (en l'ordre de la gramàtica) i, si la gramàtica és probabilística,
+        calcula els pesos acumulats de cada grup per no haver-los de recalcular a cada elecció.
+
+        Retorna:
+            tuple: Un diccionari head -> llista de bodies (tuples) i un diccionari head -> llista de probabilitats acumulades.
+        """
+        rules = defaultdict(list)
+        weights = defaultdict(list)
+        for rule in self.grammar:
+            if self.probabilistic:
+                (head, body), prob = rule
+                weights[head].append(prob)
+            else:
+                head, body = rule
+            rules[head].append(tuple(body))
+        return dict(rules), {head: list(accumulate(probs)) for head, probs in weights.items()}
 
 
     def generate_word(self, valid=True):
@@ -32,9 +58,25 @@ class GenerateWord:
             return self.generate_invalid_word(start_symbol)         # Genera una paraula que no pertany a la gramàtica.
 
 
+    def generate_many(self, k, valid=True):
+        """
+        Genera k paraules de manera mandrosa (una a una, a mesura que es demanen).
+
+        Paràmetres:
+            k (int): Nombre de paraules a generar.
+            valid (bool): Indica si les paraules generades pertanyen o no a la gramàtica (per defecte és True).
+
+        Retorna:
+            generator: Les paraules generades.
+        """
+        for _ in range(k):
+            yield self.generate_word(valid=valid)
+
+
     def generate_valid_word(self, symbol):
         """
         Genera una paraula vàlida a partir d'un símbol de la gramàtica utilitzant les regles.
+        La derivació es fa amb una pila explícita (sense recursivitat), expandint els no terminals d'esquerra a dreta.
 
         Paràmetres:
             symbol (str): El símbol a partir del qual es genera la paraula (start_symbol)
@@ -42,26 +84,25 @@ class GenerateWord:
         Retorna:
             str: Una paraula generada segons la gramàtica.
         """
-        if self.probabilistic:                                                                  # Amb probabilitats:
-            rules = [(rule, prob) for rule, prob in self.grammar if rule[0] == symbol]          # Selecciona les regles que tenen el símbol donat com a head
-            selected_rule, _ = random.choices(rules, weights=[prob for _, prob in rules])[0]    # Tria una regla aleatòria de la llista anterior segons les probabilitats
-            while selected_rule[1] == ['']:                                                     # Si la regla seleccionada és la paraula buida, escull una altre
-                selected_rule, _ = random.choices(rules, weights=[prob for _, prob in rules])[0]
-
-        else:                                                                                   # Sense probabilitats:
-            rules = [rule for rule in self.grammar if rule[0] == symbol]                        # Selecciona les regles que tenen el símbol donat com a head
-            selected_rule = random.choice(rules)                                                # Tria una regla aleatòria de la llista anterior
-            while selected_rule[1] == ['']:                                                     # Si la regla seleccionada és la paraula buida, escull una altre
-                selected_rule = random.choice(rules)
-
-        _, expansion = selected_rule                                # Obté el body de la regla seleccionada
-        word = ''                                                   # Inicialitza la paraula com a buida
-        for sym in expansion:                                       # Recorre els símbols del body
-            if sym.islower():                                       # Si el símbol és un terminal (lletra minúscula), l'afegeix directament a la paraula
-                word += sym
-            else:                                                   # Si el símbol és un no terminal, genera recursivament la part corresponent de la paraula
-                word += self.generate_valid_word(sym)
-        return word                                                 # Retorna la paraula generada
+        rules, cum_weights = self.rules, self.cum_weights
+        word = []                                                   # Símbols terminals de la paraula, en ordre
+        stack = [symbol]                                            # Símbols pendents d'expandir (el de dalt és el de més a l'esquerra)
+        while stack:
+            sym = stack.pop()
+            if sym.islower() or sym == '':                          # Si el símbol és un terminal (lletra minúscula), l'afegeix directament a la paraula
+                word.append(sym)
+                continue
+            bodies = rules.get(sym, [])                             # Regles que tenen el símbol com a head
+            if self.probabilistic:                                                              # Amb probabilitats:
+                body = random.choices(bodies, cum_weights=cum_weights.get(sym, []))[0]          # Tria una regla aleatòria segons les probabilitats
+                while body == ('',):                                                            # Si la regla seleccionada és la paraula buida, escull una altre
+                    body = random.choices(bodies, cum_weights=cum_weights.get(sym, []))[0]
+            else:                                                                               # Sense probabilitats:
+                body = random.choice(bodies)                                                    # Tria una regla aleatòria
+                while body == ('',):                                                            # Si la regla seleccionada és la paraula buida, escull una altre
+                    body = random.choice(bodies)
+            stack.extend(reversed(body))                            # El primer símbol del body queda a dalt de la pila
+        return ''.join(word)                                        # Retorna la paraula generada
 
 
     def generate_invalid_word(self, start_symbol):
@@ -81,4 +122,283 @@ class GenerateWord:
         while invalid_word[pos] == invalid_char:                        # Assegura que el nou caràcter sigui diferent del caràcter original en la posició seleccionada
             invalid_char = chr(random.randint(97, 122))
         invalid_word[pos] = invalid_char                                # Substitueix el caràcter original pel nou caràcter
-        return ''.join(invalid_word)                                    # Converteix la llista de caràcters en una cadena i la retorna com la paraula invàlida
\ No newline at end of file
+        return ''.join(invalid_word)                                    # Converteix la llista de caràcters en una cadena i la retorna com la paraula invàlida
+
+
+class LengthSampler:
+
+    def __init__(self, grammar, probabilistic=False, max_length=100):
+        """
+        Inicialitza la classe. Calcula de baix a dalt, per a cada no terminal A i cada longitud l <= max_length, el nombre
+        de derivacions de paraules de longitud l des d'A (o, si la gramàtica és probabilística, la probabilitat total
+        d'aquestes paraules). Amb aquests valors es poden generar paraules d'una longitud exacta.
+
+        Sense probabilitats, cada derivació de longitud n té la mateixa probabilitat de sortir (si la gramàtica no és
+        ambigua, és a dir, si cada paraula té una sola derivació, les paraules de longitud n surten de manera uniforme).
+        Amb probabilitats, les paraules surten amb la probabilitat de la gramàtica condicionada a la longitud.
+
+        Paràmetres:
+            grammar (list): La gramàtica en CNF, de la forma (No terminal, [Body de la regla]) o ((No terminal, [Body de la regla]), probabilitat).
+            probabilistic (bool): Indica si la gramàtica és probabilística o no (per defecte és False).
+            max_length (int): Longitud màxima de les paraules que es poden generar (per defecte 100).
+        """
+        self.probabilistic = probabilistic
+        self.max_length = max_length
+        self.lexicon = defaultdict(lambda: defaultdict(int))    # A -> {terminal: pes}
+        self.pairs = defaultdict(lambda: defaultdict(int))      # (B, C) -> {A: pes}
+        self.epsilon = 0                                        # Pes de la paraula buida (regla del símbol inicial que genera epsilon)
+        self.start_symbol = None
+        for rule in grammar:
+            (head, body), weight = rule if probabilistic else (rule, 1)
+            if self.start_symbol is None:
+                self.start_symbol = head                        # El símbol inicial és el head de la primera regla
+            if len(body) == 1 and body[0] == '':
+                if head == self.start_symbol:
+                    self.epsilon += weight
+            elif len(body) == 1 and body[0].islower():
+                self.lexicon[head][body[0]] += weight
+            elif len(body) == 2 and not body[0].islower() and not body[1].islower():
+                self.pairs[(body[0], body[1])][head] += weight
+            else:
+                raise ValueError(f"La regla {head} -> {body} no està en CNF")
+        self.binary = defaultdict(list)                         # A -> llista de (B, C, pes)
+        for (B, C), heads in self.pairs.items():
+            for A, weight in heads.items():
+                self.binary[A].append((B, C, weight))
+        self.counts = self.count_derivations()
+        self.tables = {}                                        # (A, l) -> (opcions, pesos acumulats), es calculen a mesura que calen
+
+
+    def count_derivations(self):
+        """
+        Calcula els comptes amb programació dinàmica per longituds creixents: count[A][1] és el pes de les regles A -> a
+        i count[A][l] és la suma, per a cada regla A -> B C i cada partició l = k + (l - k), de pes * count[B][k] * count[C][l - k].
+
+        Retorna:
+            dict: Un diccionari no terminal -> llista de comptes per longitud (de 0 a max_length).
+        """
+        zero = 0.0 if self.probabilistic else 0
+        counts = {}                                             # No terminal -> [compte per longitud]
+        reversed_counts = {}                                    # No terminal -> [compte per longitud] en ordre invers (per a la convolució)
+        for head, terminals in self.lexicon.items():
+            counts[head] = [zero, sum(terminals.values())]
+        pairs = [(B, C, heads) for (B, C), heads in self.pairs.items()]
+        for length in range(2, self.max_length + 1):
+            for symbol, values in counts.items():
+                reversed_counts[symbol] = values[::-1]
+            new = defaultdict(lambda: zero)
+            for B, C, heads in pairs:
+                if B in counts and C in counts:
+                    # Suma de count[B][k] * count[C][length - k] per k = 1 .. length - 1
+                    total = sum(map(mul, counts[B][1:length], reversed_counts[C][:length - 1]))
+                    if total:
+                        for A, weight in heads.items():
+                            new[A] += weight * total
+            for symbol in new:
+                counts.setdefault(symbol, [zero] * length)
+            for symbol, values in counts.items():
+                values.append(new.get(symbol, zero))
+        return counts
+
+
+    def count(self, length, symbol=None):
+        """
+        Retorna el nombre de derivacions (o la probabilitat total) de les paraules de la longitud donada.
+
+        Paràmetres:
+            length (int): La longitud de les paraules (com a màxim max_length).
+            symbol (str): El no terminal des del qual es deriva (per defecte el símbol inicial).
+
+        Retorna:
+            int o float: El nombre de derivacions o la probabilitat total.
+        """
+        symbol = symbol or self.start_symbol
+        if length == 0:
+            return self.epsilon if symbol == self.start_symbol else 0
+        return self.counts[symbol][length] if symbol in self.counts else 0
+
+
+    def table(self, symbol, length):
+        """
+        Construeix (un sol cop) les opcions per expandir el no terminal en una paraula de la longitud donada
+        amb els seus pesos acumulats: terminals si la longitud és 1, i (B, C, k) per a les regles binàries si no.
+
+        Retorna:
+            tuple: La llista d'opcions i la llista de pesos acumulats.
+        """
+        key = (symbol, length)
+        if key not in self.tables:
+            options, weights = [], []
+            if length == 1:
+                for terminal, weight in self.lexicon[symbol].items():
+                    options.append(terminal)
+                    weights.append(weight)
+            else:
+                counts = self.counts
+                for B, C, rule_weight in self.binary[symbol]:
+                    if B in counts and C in counts:
+                        for k in range(1, length):
+                            weight = rule_weight * counts[B][k] * counts[C][length - k]
+                            if weight:
+                                options.append((B, C, k))
+                                weights.append(weight)
+            self.tables[key] = (options, list(accumulate(weights)))
+        return self.tables[key]
+
+
+    def choose(self, symbol, length):
+        options, cum_weights = self.table(symbol, length)
+        if self.probabilistic:
+            return random.choices(options, cum_weights=cum_weights)[0]
+        return options[bisect_right(cum_weights, random.randrange(cum_weights[-1]))]     # Enters exactes (poden ser molt grans)
+
+
+    def sample(self, length):
+        """
+        Genera una paraula de la longitud donada. Un cop calculades les taules de les expansions que fa servir, cada
+        no terminal de la derivació es tria amb una cerca binària.
+
+        Paràmetres:
+            length (int): La longitud de la paraula (com a màxim max_length).
+
+        Retorna:
+            str: La paraula generada, o None si la gramàtica no genera cap paraula d'aquesta longitud.
+        """
+        if length > self.max_length:
+            raise ValueError(f"La longitud {length} és més gran que max_length ({self.max_length})")
+        if not self.count(length):
+            return None
+        if length == 0:
+            return ''
+        word = []
+        stack = [(self.start_symbol, length)]
+        while stack:                                    # Es deriva d'esquerra a dreta amb una pila explícita
+            symbol, length = stack.pop()
+            choice = self.choose(symbol, length)
+            if length == 1:
+                word.append(choice)
+            else:
+                B, C, k = choice
+                stack.append((C, length - k))
+                stack.append((B, k))
+        return ''.join(word)
+
+
+    def sample_many(self, k, length):
+        """
+        Genera k paraules de la longitud donada de manera mandrosa.
+
+        Paràmetres:
+            k (int): Nombre de paraules a generar.
+            length (int): La longitud de les paraules.
+
+        Retorna:
+            generator: Les paraules generades (cap si la gramàtica no en genera d'aquesta longitud).
+        """
+        if self.count(length):
+            for _ in range(k):
+                yield self.sample(length)
+
+
+class NegativeWordGenerator:
+
+    STRATEGIES = ('substitution', 'insertion', 'deletion', 'swap')
+
+    def __init__(self, grammar, probabilistic=False, strategies=STRATEGIES, recognizer=None):
+        """
+        Inicialitza la classe. Genera paraules que no pertanyen a la gramàtica aplicant mutacions a paraules vàlides
+        i comprovant amb un reconeixedor que realment no hi pertanyen (a diferència de GenerateWord.generate_invalid_word).
+
+        Paràmetres:
+            grammar (list): La gramàtica en CNF (amb o sense probabilitats).
+            probabilistic (bool): Indica si la gramàtica és probabilística o no (per defecte és False).
+            strategies (tuple): Mutacions que es fan servir: 'substitution', 'insertion', 'deletion' i/o 'swap'.
+            recognizer (object): Objecte amb un mètode parse(word) que comprova si la paraula pertany a la gramàtica
+                                 (per defecte un BitsetCKY de la gramàtica sense probabilitats).
+        """
+        unknown = set(strategies) - set(self.STRATEGIES)
+        if unknown or not strategies:
+            raise ValueError(f"Estratègies no vàlides: {sorted(unknown) or strategies}")
+        rules = [rule for rule, _ in grammar] if probabilistic else grammar
+        self.word_generator = GenerateWord(grammar, probabilistic)
+        self.recognizer = recognizer or BitsetCKY(rules)
+        self.strategies = tuple(strategies)
+        terminals = sorted({body[0] for _, body in rules if len(body) == 1 and body[0] != ''})
+        self.alphabet = terminals if len(terminals) > 1 else [chr(code) for code in range(97, 123)]     # Amb un sol terminal, les substitucions no canviarien res
+        self.stats = {'attempts': 0, 'accepted': 0, 'collisions': 0, 'duplicates': 0, 'unchanged': 0, 'too_long': 0}
+
+
+    def mutate(self, word):
+        """
+        Aplica una mutació aleatòria a la paraula.
+
+        Paràmetres:
+            word (str): La paraula a modificar.
+
+        Retorna:
+            str: La paraula modificada (pot ser igual que l'original si la mutació no és aplicable).
+        """
+        strategy = random.choice(self.strategies)
+        if not word:
+            strategy = 'insertion'                                  # A la paraula buida només s'hi pot inserir
+        pos = random.randrange(len(word) + (strategy == 'insertion'))
+        if strategy == 'substitution':
+            char = random.choice(self.alphabet)
+            return word[:pos] + char + word[pos + 1:]
+        if strategy == 'insertion':
+            return word[:pos] + random.choice(self.alphabet) + word[pos:]
+        if strategy == 'deletion':
+            return word[:pos] + word[pos + 1:]
+        if len(word) < 2:                                           # Intercanvi de dos caràcters consecutius
+            return word
+        pos = min(pos, len(word) - 2)
+        return word[:pos] + word[pos + 1] + word[pos] + word[pos + 2:]
+
+
+    def generate(self, k, max_attempts=None, max_length=None):
+        """
+        Genera fins a k paraules diferents que no pertanyen a la gramàtica, de manera mandrosa. Les paraules mutades
+        que el reconeixedor accepta (col·lisions) i les repetides es descarten; els comptadors queden a stats.
+
+        Paràmetres:
+            k (int): Nombre de paraules a generar.
+            max_attempts (int): Nombre màxim de mutacions a provar (per defecte 100 * k), per si la gramàtica
+                                té molt poques paraules invàlides a prop de les vàlides.
+            max_length (int): Longitud màxima de les paraules vàlides que es muten (per defecte sense límit);
+                              les més llargues es descarten per no haver de comprovar paraules molt llargues.
+
+        Retorna:
+            generator: Les paraules generades.
+        """
+        max_attempts = 100 * k if max_attempts is None else max_attempts
+        seen = set()
+        produced = attempts = 0
+        while produced < k and attempts < max_attempts:
+            attempts += 1
+            self.stats['attempts'] += 1
+            word = self.word_generator.generate_word(valid=True)
+            if max_length is not None and len(word) > max_length:
+                self.stats['too_long'] += 1
+                continue
+            mutated = self.mutate(word)
+            if mutated == word:
+                self.stats['unchanged'] += 1
+            elif mutated in seen:
+                self.stats['duplicates'] += 1
+            elif self.recognizer.parse(mutated):
+                self.stats['collisions'] += 1
+            else:
+                seen.add(mutated)
+                produced += 1
+                self.stats['accepted'] += 1
+                yield mutated
+
+
+    def efficiency(self):
+        """
+        Retorna la proporció de mutacions provades que han donat una paraula nova que no pertany a la gramàtica.
+
+        Retorna:
+            float: L'eficiència del mostreig amb rebuig (0.0 si encara no s'ha provat cap mutació).
+        """
+        return self.stats['accepted'] / self.stats['attempts'] if self.stats['attempts'] else 0.0